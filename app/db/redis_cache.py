@@ -1,31 +1,94 @@
 import os
 import json
 import redis
-from typing import Optional, Any
+import redis.asyncio as redis_asyncio
+from typing import Optional, Any, Dict, List
 from dotenv import load_dotenv
 
 load_dotenv()
 
 REDIS_HOST = os.getenv('REDIS_HOST', 'redis-17265.c212.ap-south-1-1.ec2.redns.redis-cloud.com')
 REDIS_PORT = int(os.getenv('REDIS_PORT', '17265'))
-REDIS_DB = os.getenv('REDIS_DB', 'default')
+REDIS_DB = os.getenv('REDIS_DB', '0')
 REDIS_PASSWORD = os.getenv('REDIS_PASSWORD')
+REDIS_MAX_CONNECTIONS = int(os.getenv('REDIS_MAX_CONNECTIONS', '50'))
+REDIS_SOCKET_TIMEOUT = float(os.getenv('REDIS_SOCKET_TIMEOUT', '10'))
+
+
+def _connection_kwargs() -> Dict[str, Any]:
+    return {
+        "host": REDIS_HOST,
+        "port": REDIS_PORT,
+        # Older configs used REDIS_DB=default, which isn't a valid index
+        "db": int(REDIS_DB) if str(REDIS_DB).isdigit() else 0,
+        "password": REDIS_PASSWORD,
+        "socket_timeout": REDIS_SOCKET_TIMEOUT,
+        "socket_connect_timeout": REDIS_SOCKET_TIMEOUT,
+        "health_check_interval": 30,
+        "max_connections": REDIS_MAX_CONNECTIONS
+    }
+
+
+# One sized pool per response mode, shared by every module in the process.
+# The text client decodes replies to str (streams, hashes, counters); the
+# binary client returns raw bytes for values written with the cache serializer.
+redis_pool = redis.ConnectionPool(decode_responses=True, **_connection_kwargs())
+binary_pool = redis.ConnectionPool(decode_responses=False, **_connection_kwargs())
+redis_client = redis.Redis(connection_pool=redis_pool)
+binary_client = redis.Redis(connection_pool=binary_pool)
+
+# Async binary client for the event loop, created on first use
+_async_client = None
+
+
+def get_async_client():
+    """Return the shared redis.asyncio client (binary replies)"""
+    global _async_client
+    if _async_client is None:
+        _async_client = redis_asyncio.Redis(
+            connection_pool=redis_asyncio.ConnectionPool(decode_responses=False, **_connection_kwargs())
+        )
+    return _async_client
+
+
+async def close_async_client():
+    global _async_client
+    if _async_client is not None:
+        await _async_client.close()
+        _async_client = None
+
+
+# Pluggable cache serializers: name -> (dumps to bytes, loads from bytes)
+SERIALIZERS: Dict[str, tuple] = {
+    "json": (lambda value: json.dumps(value, separators=(",", ":")).encode("utf-8"), json.loads),
+}
+
+try:
+    import msgpack
+    SERIALIZERS["msgpack"] = (
+        lambda value: msgpack.packb(value, use_bin_type=True),
+        lambda data: msgpack.unpackb(data, raw=False)
+    )
+except ImportError:
+    msgpack = None
+
+CACHE_SERIALIZER = os.getenv('CACHE_SERIALIZER', 'msgpack' if msgpack else 'json')
+
+
+def serialize(value: Any) -> bytes:
+    return SERIALIZERS[CACHE_SERIALIZER][0](value)
+
+
+def deserialize(data: bytes) -> Any:
+    return SERIALIZERS[CACHE_SERIALIZER][1](data)
 
-# Initialize Redis client
-redis_client = redis.Redis(
-    host=REDIS_HOST,
-    port=REDIS_PORT,
-    db=REDIS_DB,
-    password=REDIS_PASSWORD,
-    decode_responses=True
-)
 
 def get_cache(key: str) -> Optional[Any]:
     """Get value from Redis cache"""
     try:
-        value = redis_client.get(key)
+        value = binary_client.get(key)
         if value:
-            return json.loads(value)
+            return deserialize(value)
         return None
     except Exception as e:
         print(f"Error getting from cache: {str(e)}")
@@ -34,10 +97,10 @@ def get_cache(key: str) -> Optional[Any]:
 def set_cache(key: str, value: Any, expiry_seconds: int = 3600) -> bool:
     """Set value in Redis cache with expiry"""
     try:
-        redis_client.setex(
+        binary_client.setex(
             key,
             expiry_seconds,
-            json.dumps(value)
+            serialize(value)
         )
         return True
     except Exception as e:
@@ -51,4 +114,101 @@ def delete_cache(key: str) -> bool:
         return True
     except Exception as e:
         print(f"Error deleting from cache: {str(e)}")
-        return False
\ No newline at end of file
+        return False
+
+
+async def get_bytes_async(key: str) -> Optional[bytes]:
+    """Get a raw bytes value (no serializer)"""
+    try:
+        return await get_async_client().get(key)
+    except Exception as e:
+        print(f"Error getting from cache: {str(e)}")
+        return None
+
+
+async def set_bytes_async(key: str, value: bytes, expiry_seconds: int = 3600) -> bool:
+    """Set a raw bytes value with expiry (no serializer)"""
+    try:
+        await get_async_client().setex(key, expiry_seconds, value)
+        return True
+    except Exception as e:
+        print(f"Error setting cache: {str(e)}")
+        return False
+
+
+# Delete a lock only if it still holds our token, so an expired lease
+# re-acquired by another worker is never released by the old holder
+_RELEASE_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+async def acquire_lock_async(key: str, token: str, ttl_ms: int) -> bool:
+    """Try to take a lease on key for ttl_ms; False if held or Redis is unavailable"""
+    try:
+        return bool(await get_async_client().set(key, token, nx=True, px=ttl_ms))
+    except Exception as e:
+        print(f"Error acquiring lock: {str(e)}")
+        return False
+
+
+async def lock_exists_async(key: str) -> bool:
+    try:
+        return bool(await get_async_client().exists(key))
+    except Exception as e:
+        print(f"Error checking lock: {str(e)}")
+        return False
+
+
+async def release_lock_async(key: str, token: str) -> bool:
+    """Release a lease taken with acquire_lock_async, if we still hold it"""
+    try:
+        return bool(await get_async_client().eval(_RELEASE_LOCK_SCRIPT, 1, key, token))
+    except Exception as e:
+        print(f"Error releasing lock: {str(e)}")
+        return False
+
+
+def get_counter(key: str) -> int:
+    """Read an integer counter maintained with incr_cache (0 if unset)"""
+    try:
+        value = redis_client.get(key)
+        return int(value) if value else 0
+    except Exception as e:
+        print(f"Error getting counter: {str(e)}")
+        return 0
+
+
+def incr_cache(key: str) -> Optional[int]:
+    """Atomically increment an integer counter in Redis"""
+    try:
+        return redis_client.incr(key)
+    except Exception as e:
+        print(f"Error incrementing cache counter: {str(e)}")
+        return None
+
+
+def get_hash_cache(key: str, fields: List[str]) -> List[Optional[str]]:
+    """Get several fields of a Redis hash in one round trip"""
+    if not fields:
+        return []
+    try:
+        return redis_client.hmget(key, fields)
+    except Exception as e:
+        print(f"Error getting hash fields from cache: {str(e)}")
+        return [None] * len(fields)
+
+
+def set_hash_cache(key: str, mapping: Dict[str, str]) -> bool:
+    """Set several fields of a Redis hash in one round trip"""
+    if not mapping:
+        return True
+    try:
+        redis_client.hset(key, mapping=mapping)
+        return True
+    except Exception as e:
+        print(f"Error setting hash fields in cache: {str(e)}")
+        return False
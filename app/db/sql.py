@@ -1,7 +1,14 @@
 import os
+import re
+import threading
+import time
 import psycopg2
+import psycopg2.extensions
+import psycopg2.extras
+from psycopg2.pool import ThreadedConnectionPool
+from contextlib import contextmanager
 from datetime import datetime
-from typing import List, Dict
+from typing import List, Dict, Optional, Tuple
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -9,15 +16,116 @@ load_dotenv()
 # Use environment variable for database connection
 DATABASE_URL = os.getenv('DATABASE_URL')
 
+# Connection pool settings
+DB_POOL_MIN = int(os.getenv('DB_POOL_MIN', '1'))
+DB_POOL_MAX = int(os.getenv('DB_POOL_MAX', '10'))
+# Connections idle longer than this are checked with SELECT 1 before use
+DB_HEALTHCHECK_INTERVAL = float(os.getenv('DB_HEALTHCHECK_INTERVAL', '30'))
+# Server-side prepared statements don't survive PgBouncer transaction pooling
+# (e.g. Neon "-pooler" hosts), so they default to off there
+DB_PREPARE_STATEMENTS = os.getenv(
+    'DB_PREPARE_STATEMENTS',
+    'false' if DATABASE_URL and '-pooler' in DATABASE_URL else 'true'
+).lower() == 'true'
+
+
+class PooledConnection(psycopg2.extensions.connection):
+    """Connection that remembers its prepared statements and when it was last used"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared = set()
+        self.last_used = time.monotonic()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+# ThreadedConnectionPool raises instead of blocking when exhausted; this makes callers wait
+_pool_slots = threading.BoundedSemaphore(DB_POOL_MAX)
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadedConnectionPool(
+                    DB_POOL_MIN, DB_POOL_MAX, DATABASE_URL,
+                    connection_factory=PooledConnection
+                )
+    return _pool
+
+
+def close_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
+
+
+def _is_healthy(conn) -> bool:
+    if conn.closed:
+        return False
+    if time.monotonic() - conn.last_used < DB_HEALTHCHECK_INTERVAL:
+        return True
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT 1")
+        conn.rollback()
+        return True
+    except psycopg2.Error:
+        return False
+
+
+@contextmanager
+def pooled_connection():
+    """Borrow a healthy connection from the pool; commit on success, roll back on error"""
+    pool = get_pool()
+    _pool_slots.acquire()
+    try:
+        conn = pool.getconn()
+        if not _is_healthy(conn):
+            pool.putconn(conn, close=True)
+            conn = pool.getconn()
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            if not conn.closed:
+                conn.rollback()
+            raise
+        finally:
+            conn.last_used = time.monotonic()
+            pool.putconn(conn, close=bool(conn.closed))
+    finally:
+        _pool_slots.release()
+
+
+def _execute(cursor, name: str, sql: str, params: tuple):
+    """
+    Execute sql written with $1..$n placeholders (each used once, in order),
+    as a per-connection prepared statement when enabled.
+    """
+    if not DB_PREPARE_STATEMENTS:
+        cursor.execute(re.sub(r'\$\d+', '%s', sql), params)
+        return
+    conn = cursor.connection
+    if name not in conn.prepared:
+        cursor.execute(f"PREPARE {name} AS {sql}")
+        conn.prepared.add(name)
+    placeholders = ", ".join(["%s"] * len(params))
+    cursor.execute(f"EXECUTE {name} ({placeholders})", params)
+
+
 def get_db_connection():
     return psycopg2.connect(DATABASE_URL)
 
-def init_db():
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    # Create chat_history table if not exists
-    cursor.execute("""
+# Schema migrations, applied once each in order and recorded in schema_migrations.
+# Statements that can't run inside a transaction (CREATE INDEX CONCURRENTLY) are
+# flagged so they run in autocommit mode.
+MIGRATIONS = [
+    (1, """
     CREATE TABLE IF NOT EXISTS chat_history (
         id SERIAL PRIMARY KEY,
         session_id TEXT,
@@ -25,55 +133,226 @@ def init_db():
         content TEXT,
         timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
     )
-    """)
-    
-    conn.commit()
-    cursor.close()
-    conn.close()
+    """, False),
+    # Serves both the per-session history lookups (ORDER BY id) and deletes
+    (2, """
+    CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_chat_history_session_id_id
+    ON chat_history (session_id, id)
+    """, True),
+    # Idempotency key for write-behind inserts (NULL for direct writes)
+    (3, """
+    ALTER TABLE chat_history ADD COLUMN IF NOT EXISTS message_key TEXT
+    """, False),
+    (4, """
+    CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS idx_chat_history_message_key
+    ON chat_history (message_key)
+    """, True),
+]
 
-def save_chat_message(session_id: str, role: str, content: str):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    query = "INSERT INTO chat_history (session_id, role, content) VALUES (%s, %s, %s)"
-    cursor.execute(query, (session_id, role, content))
-    
-    conn.commit()
-    cursor.close()
-    conn.close()
 
-def get_chat_history(session_id: str, limit: int = 50) -> List[Dict]:
+# Advisory lock key held while migrating, so workers starting together apply
+# each migration once
+MIGRATION_LOCK_ID = 7246013
+
+_CONCURRENT_INDEX_RE = re.compile(r'INDEX\s+CONCURRENTLY\s+IF\s+NOT\s+EXISTS\s+(\w+)', re.IGNORECASE)
+
+
+def _index_valid(cursor, name: str) -> Optional[bool]:
+    """pg_index.indisvalid for an index, or None if it doesn't exist"""
+    cursor.execute(
+        """
+        SELECT i.indisvalid FROM pg_index i
+        JOIN pg_class c ON c.oid = i.indexrelid
+        WHERE c.relname = %s
+        """,
+        (name,)
+    )
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def _build_index(cursor, name: str, statement: str) -> None:
+    """
+    Run a CREATE INDEX CONCURRENTLY IF NOT EXISTS. An interrupted or failed
+    concurrent build leaves an INVALID index that IF NOT EXISTS would accept,
+    so such an index is dropped and built again.
+    """
+    for attempt in range(2):
+        if _index_valid(cursor, name) is False:
+            print(f"Dropping invalid index {name}")
+            cursor.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+        cursor.execute(statement)
+        if _index_valid(cursor, name):
+            return
+    raise RuntimeError(f"Index {name} is still invalid after rebuilding it")
+
+
+def run_migrations():
+    """Apply any migrations not yet recorded in schema_migrations"""
     conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    query = """
-    SELECT role, content, timestamp 
-    FROM chat_history 
-    WHERE session_id = %s 
-    ORDER BY timestamp DESC 
-    LIMIT %s
+    try:
+        conn.autocommit = True
+        with conn.cursor() as cursor:
+            # Session-level: held across the autocommit and transactional steps
+            cursor.execute("SELECT pg_advisory_lock(%s)", (MIGRATION_LOCK_ID,))
+            cursor.execute("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version INTEGER PRIMARY KEY,
+                applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            """)
+            cursor.execute("SELECT version FROM schema_migrations")
+            applied = {row[0] for row in cursor.fetchall()}
+
+        for version, statement, non_transactional in MIGRATIONS:
+            if version in applied:
+                continue
+            print(f"Applying database migration {version}")
+            conn.autocommit = non_transactional
+            with conn.cursor() as cursor:
+                index = _CONCURRENT_INDEX_RE.search(statement) if non_transactional else None
+                if index:
+                    _build_index(cursor, index.group(1), statement)
+                else:
+                    cursor.execute(statement)
+                cursor.execute(
+                    "INSERT INTO schema_migrations (version) VALUES (%s) ON CONFLICT DO NOTHING",
+                    (version,)
+                )
+            if not non_transactional:
+                conn.commit()
+    finally:
+        # Closing the session also releases the advisory lock
+        conn.close()
+
+def init_db():
+    run_migrations()
+
+def save_chat_message(session_id: str, role: str, content: str) -> int:
+    """Insert a message and return its id"""
+    with pooled_connection() as conn:
+        with conn.cursor() as cursor:
+            _execute(
+                cursor, "save_chat_message",
+                "INSERT INTO chat_history (session_id, role, content) VALUES ($1, $2, $3) RETURNING id",
+                (session_id, role, content)
+            )
+            return cursor.fetchone()[0]
+
+def save_chat_messages_batch(messages: List[Dict]) -> int:
     """
-    cursor.execute(query, (session_id, limit))
-    
-    messages = [{
-        "role": row[0],
-        "content": row[1],
-        "timestamp": row[2].isoformat()
-    } for row in cursor.fetchall()]
-    
-    cursor.close()
-    conn.close()
+    Insert many messages with one multi-row INSERT. Each message needs
+    session_id, role, content, timestamp and message_key; rows whose
+    message_key already exists are skipped, so replays are harmless.
+    Returns the number of rows inserted.
+    """
+    if not messages:
+        return 0
+    with pooled_connection() as conn:
+        with conn.cursor() as cursor:
+            psycopg2.extras.execute_values(
+                cursor,
+                """
+                INSERT INTO chat_history (session_id, role, content, timestamp, message_key)
+                VALUES %s
+                ON CONFLICT (message_key) DO NOTHING
+                """,
+                [(m["session_id"], m["role"], m["content"], m["timestamp"], m["message_key"]) for m in messages],
+                page_size=len(messages)
+            )
+            return cursor.rowcount
+
+def get_chat_history_page(session_id: str, limit: int = 50,
+                          before_id: Optional[int] = None) -> Tuple[List[Dict], Optional[int]]:
+    """
+    Keyset-paginated history: up to limit messages older than before_id (or the
+    newest ones), in chronological order, plus the cursor for the next older
+    page (None when there are no more).
+    """
+    with pooled_connection() as conn:
+        with conn.cursor() as cursor:
+            if before_id is None:
+                _execute(
+                    cursor, "get_chat_history",
+                    """
+                    SELECT id, role, content, timestamp, message_key 
+                    FROM chat_history 
+                    WHERE session_id = $1 
+                    ORDER BY id DESC 
+                    LIMIT $2
+                    """,
+                    (session_id, limit)
+                )
+            else:
+                _execute(
+                    cursor, "get_chat_history_before",
+                    """
+                    SELECT id, role, content, timestamp, message_key 
+                    FROM chat_history 
+                    WHERE session_id = $1 AND id < $2 
+                    ORDER BY id DESC 
+                    LIMIT $3
+                    """,
+                    (session_id, before_id, limit)
+                )
+            
+            messages = [{
+                "id": row[0],
+                "role": row[1],
+                "content": row[2],
+                "timestamp": row[3].isoformat(),
+                "message_key": row[4]
+            } for row in cursor.fetchall()]
     
-    return messages[::-1]  # Reverse to get chronological order
+    next_cursor = messages[-1]["id"] if len(messages) == limit else None
+    return messages[::-1], next_cursor  # Reverse to get chronological order
+
+def get_chat_history(session_id: str, limit: int = 50) -> List[Dict]:
+    messages, _ = get_chat_history_page(session_id, limit)
+    return messages
 
 def delete_chat_history(session_id: str) -> None:
     """Delete all chat history for a given session ID"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    query = "DELETE FROM chat_history WHERE session_id = %s"
-    cursor.execute(query, (session_id,))
-    
-    conn.commit()
-    cursor.close()
-    conn.close()
+    with pooled_connection() as conn:
+        with conn.cursor() as cursor:
+            _execute(
+                cursor, "delete_chat_history",
+                "DELETE FROM chat_history WHERE session_id = $1",
+                (session_id,)
+            )
+
+def delete_chat_messages(message_keys: List[str]) -> None:
+    """Delete write-behind messages by message_key"""
+    if not message_keys:
+        return
+    with pooled_connection() as conn:
+        with conn.cursor() as cursor:
+            _execute(
+                cursor, "delete_chat_messages",
+                "DELETE FROM chat_history WHERE message_key = ANY($1)",
+                (list(message_keys),)
+            )
+
+def get_message_ids(session_id: str, message_keys: List[str]) -> Dict[str, int]:
+    """Ids of flushed write-behind messages, by message_key"""
+    if not message_keys:
+        return {}
+    with pooled_connection() as conn:
+        with conn.cursor() as cursor:
+            _execute(
+                cursor, "get_message_ids",
+                "SELECT message_key, id FROM chat_history WHERE session_id = $1 AND message_key = ANY($2)",
+                (session_id, list(message_keys))
+            )
+            return dict(cursor.fetchall())
+
+def get_latest_message_id(session_id: str) -> Optional[int]:
+    with pooled_connection() as conn:
+        with conn.cursor() as cursor:
+            _execute(
+                cursor, "get_latest_message_id",
+                "SELECT max(id) FROM chat_history WHERE session_id = $1",
+                (session_id,)
+            )
+            return cursor.fetchone()[0]
+
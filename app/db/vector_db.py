@@ -1,7 +1,15 @@
-from qdrant_client import QdrantClient
+from qdrant_client import QdrantClient, AsyncQdrantClient
 from qdrant_client.http import models
+import hashlib
+import itertools
 import os
+import time
+import uuid
+from concurrent import futures
+from datetime import datetime, timezone
 from dotenv import load_dotenv
+from ..services.chunking import document_id
+from ..services.sparse import document_sparse_vector, query_sparse_vector
 
 load_dotenv()
 
@@ -11,20 +19,295 @@ QDRANT_API_KEY = os.getenv('QDRANT_API_KEY')
 QDRANT_COLLECTION_NAME = os.getenv('QDRANT_COLLECTION_NAME')
 VECTOR_SIZE = int(os.getenv('VECTOR_SIZE'))
 
+# Named sparse (BM25) vector stored next to the unnamed dense vector
+SPARSE_VECTOR_NAME = "bm25"
+
+# Numeric (unix seconds) publish time, indexed so time windows are filtered inside Qdrant
+PUBLISHED_AT_FIELD = "published_at"
+
+# Bulk-load settings
+QDRANT_PREFER_GRPC = os.getenv('QDRANT_PREFER_GRPC', 'false').lower() == 'true'
+QDRANT_BULK_BATCH_SIZE = int(os.getenv('QDRANT_BULK_BATCH_SIZE', '256'))
+QDRANT_BULK_PARALLEL = int(os.getenv('QDRANT_BULK_PARALLEL', '4'))
+
+# Vector storage: "none", "scalar" (int8, 4x smaller) or "binary" (1 bit per
+# dimension, 32x smaller). Quantized vectors are kept in RAM and, by default,
+# the float32 originals move to disk and are only read to rescore candidates.
+QDRANT_QUANTIZATION = os.getenv('QDRANT_QUANTIZATION', 'none').lower()
+QDRANT_VECTORS_ON_DISK = (
+    os.getenv('QDRANT_VECTORS_ON_DISK') or ('false' if QDRANT_QUANTIZATION == 'none' else 'true')
+).lower() == 'true'
+QDRANT_SCALAR_QUANTILE = float(os.getenv('QDRANT_SCALAR_QUANTILE', '0.99'))
+
+# Segments larger than this many KB of vectors get an HNSW index; smaller ones
+# are searched exhaustively. 0 disables HNSW indexing entirely.
+QDRANT_INDEXING_THRESHOLD = int(os.getenv('QDRANT_INDEXING_THRESHOLD', '20000'))
+
+# Per-query search params; QDRANT_HNSW_EF=0 leaves Qdrant's default
+QDRANT_HNSW_EF = int(os.getenv('QDRANT_HNSW_EF', '0'))
+QDRANT_OVERSAMPLING = float(os.getenv('QDRANT_OVERSAMPLING', '2.0'))
+QDRANT_RESCORE = os.getenv('QDRANT_RESCORE', 'true').lower() == 'true'
+
+
+def _client_kwargs():
+    # QDRANT_URL=":memory:" runs Qdrant's in-process local mode (benchmarks, local runs)
+    if QDRANT_URL == ":memory:":
+        return {"location": ":memory:"}
+    return {"url": QDRANT_URL, "api_key": QDRANT_API_KEY, "timeout": 20.0}
+
+
 # Initialize Qdrant client
-client = QdrantClient(
-    url=QDRANT_URL,
-    api_key=QDRANT_API_KEY,
-    timeout=20.0
-)
+client = QdrantClient(**_client_kwargs())
+
+# Async client for the request path, so searches don't block the event loop
+async_client = AsyncQdrantClient(**_client_kwargs())
+
+# Separate client for bulk loads, optionally over gRPC with a longer timeout
+_bulk_client = None
+
+# Set once the collection is known to exist, so inserts skip the check
+_collection_ready = False
+
+# Cached collection metadata (vector size, point count) so the search hot path
+# is a single request. Refreshed on TTL expiry, by ensure_collection_exists and
+# insert_documents, and whenever a search fails.
+COLLECTION_META_TTL = float(os.getenv('COLLECTION_META_TTL', '300'))
+_collection_meta = None
+# Whether the collection has the sparse vector; kept across meta invalidations
+_collection_has_sparse = None
+
+
+def _store_collection_meta(collection_info, count):
+    global _collection_meta, _collection_has_sparse
+    _collection_has_sparse = SPARSE_VECTOR_NAME in (collection_info.config.params.sparse_vectors or {})
+    _collection_meta = {
+        "vector_size": collection_info.config.params.vectors.size,
+        "has_sparse": _collection_has_sparse,
+        "points_count": count.count,
+        "checked_at": time.monotonic()
+    }
+    return _collection_meta
+
+
+def invalidate_collection_meta():
+    """Force the next search to revalidate collection metadata"""
+    global _collection_meta
+    _collection_meta = None
+
+
+def _cached_collection_meta():
+    """Return cached metadata if fresh and known to be non-empty, else None"""
+    meta = _collection_meta
+    if meta is None or time.monotonic() - meta["checked_at"] > COLLECTION_META_TTL:
+        return None
+    # An empty collection may be filled by another process at any time
+    if meta["points_count"] == 0:
+        return None
+    return meta
+
+
+def refresh_collection_meta():
+    """Fetch vector size and point count from Qdrant and cache them"""
+    return _store_collection_meta(
+        client.get_collection(QDRANT_COLLECTION_NAME),
+        client.count(QDRANT_COLLECTION_NAME)
+    )
+
+
+async def refresh_collection_meta_async():
+    """Async variant of refresh_collection_meta"""
+    return _store_collection_meta(
+        await async_client.get_collection(QDRANT_COLLECTION_NAME),
+        await async_client.count(QDRANT_COLLECTION_NAME)
+    )
+
+
+def quantization_config(mode=None):
+    """Qdrant quantization config for a QDRANT_QUANTIZATION mode (None for "none")"""
+    mode = (mode or QDRANT_QUANTIZATION).lower()
+    if mode == "scalar":
+        return models.ScalarQuantization(scalar=models.ScalarQuantizationConfig(
+            type=models.ScalarType.INT8,
+            quantile=QDRANT_SCALAR_QUANTILE,
+            always_ram=True
+        ))
+    if mode == "binary":
+        return models.BinaryQuantization(binary=models.BinaryQuantizationConfig(always_ram=True))
+    if mode != "none":
+        raise ValueError(f"Unknown QDRANT_QUANTIZATION mode: {mode}")
+    return None
+
+
+def search_params(hnsw_ef=None, oversampling=None, rescore=None, exact=False):
+    """
+    Per-query search params. Quantized collections search the in-RAM quantized
+    vectors for limit * oversampling candidates, then rescore them with the
+    original vectors when rescore is on.
+    """
+    hnsw_ef = QDRANT_HNSW_EF if hnsw_ef is None else hnsw_ef
+    quantization = None
+    if QDRANT_QUANTIZATION != "none":
+        quantization = models.QuantizationSearchParams(
+            rescore=QDRANT_RESCORE if rescore is None else rescore,
+            oversampling=QDRANT_OVERSAMPLING if oversampling is None else oversampling
+        )
+    return models.SearchParams(hnsw_ef=hnsw_ef or None, exact=exact, quantization=quantization)
+
+
+def _quantization_mode(collection_info):
+    config = collection_info.config.quantization_config
+    if isinstance(config, models.ScalarQuantization):
+        return "scalar"
+    if isinstance(config, models.BinaryQuantization):
+        return "binary"
+    return "none"
+
+
+def migrate_collection_config(collection_info=None):
+    """
+    Bring an existing collection's vector storage and indexing in line with
+    QDRANT_QUANTIZATION / QDRANT_VECTORS_ON_DISK / QDRANT_INDEXING_THRESHOLD.
+    Qdrant applies the change in place and rebuilds segments in the
+    background; searches keep working meanwhile. Returns True if a change was
+    requested.
+    """
+    collection_info = collection_info or client.get_collection(QDRANT_COLLECTION_NAME)
+    current_mode = _quantization_mode(collection_info)
+    current_on_disk = bool(collection_info.config.params.vectors.on_disk)
+    current_threshold = collection_info.config.optimizer_config.indexing_threshold
+    changes = {}
+    if current_mode != QDRANT_QUANTIZATION or current_on_disk != QDRANT_VECTORS_ON_DISK:
+        print(f"Migrating collection {QDRANT_COLLECTION_NAME}: quantization {current_mode} -> "
+              f"{QDRANT_QUANTIZATION}, vectors on disk {current_on_disk} -> {QDRANT_VECTORS_ON_DISK}")
+        changes["vectors_config"] = {"": models.VectorParamsDiff(on_disk=QDRANT_VECTORS_ON_DISK)}
+        changes["quantization_config"] = quantization_config() or models.Disabled.DISABLED
+    if current_threshold != QDRANT_INDEXING_THRESHOLD:
+        # Collections created with indexing_threshold=0 never built an HNSW index
+        print(f"Migrating collection {QDRANT_COLLECTION_NAME}: indexing threshold "
+              f"{current_threshold} -> {QDRANT_INDEXING_THRESHOLD}")
+        changes["optimizers_config"] = models.OptimizersConfigDiff(indexing_threshold=QDRANT_INDEXING_THRESHOLD)
+    if not changes:
+        return False
+
+    client.update_collection(collection_name=QDRANT_COLLECTION_NAME, **changes)
+    return True
+
+
+def published_timestamp(value):
+    """Unix seconds of a publish date (datetime or ISO string, naive means UTC); None if unparseable"""
+    try:
+        if isinstance(value, str):
+            value = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return int(value.timestamp())
+    except (TypeError, ValueError, AttributeError):
+        return None
+
+
+def _backfill_payload(field, compute, fields):
+    """
+    Set field on every point that lacks it to compute(payload), where payload
+    holds the given source fields. Returns the number of points updated.
+    """
+    backfilled = 0
+    offset = None
+    missing = models.Filter(must=[models.IsEmptyCondition(is_empty=models.PayloadField(key=field))])
+    while True:
+        points, offset = client.scroll(
+            collection_name=QDRANT_COLLECTION_NAME, scroll_filter=missing,
+            limit=512, offset=offset, with_payload=fields, with_vectors=False
+        )
+        operations = []
+        for point in points:
+            value = compute(point.payload or {})
+            if value is not None:
+                operations.append(models.SetPayloadOperation(set_payload=models.SetPayload(
+                    payload={field: value}, points=[point.id]
+                )))
+        if operations:
+            client.batch_update_points(collection_name=QDRANT_COLLECTION_NAME, update_operations=operations)
+            backfilled += len(operations)
+        if offset is None:
+            break
+    return backfilled
+
+
+def ensure_doc_id_index():
+    """
+    Migrate a collection created before points carried a doc_id: backfill it
+    from each point's url/title/date payload, so stale chunks of those
+    articles can be deleted on re-ingestion, then add the keyword index.
+    """
+    collection_info = client.get_collection(QDRANT_COLLECTION_NAME)
+    if "doc_id" in (collection_info.payload_schema or {}):
+        return
+    print(f"Adding doc_id index to {QDRANT_COLLECTION_NAME}")
+    backfilled = _backfill_payload("doc_id", document_id, ["url", "title", "date"])
+    print(f"Backfilled doc_id on {backfilled} points")
+    # Indexed last, so a migration that stops half way is resumed on the next start
+    client.create_payload_index(
+        collection_name=QDRANT_COLLECTION_NAME,
+        field_name="doc_id",
+        field_schema=models.PayloadSchemaType.KEYWORD
+    )
+
+
+def ensure_published_at_index():
+    """
+    Add the published_at index to a collection created before it existed,
+    after backfilling the field from each point's date payload.
+    """
+    collection_info = client.get_collection(QDRANT_COLLECTION_NAME)
+    if PUBLISHED_AT_FIELD in (collection_info.payload_schema or {}):
+        return
+    print(f"Adding {PUBLISHED_AT_FIELD} index to {QDRANT_COLLECTION_NAME}")
+    backfilled = _backfill_payload(
+        PUBLISHED_AT_FIELD, lambda payload: published_timestamp(payload.get("date")), ["date"]
+    )
+    print(f"Backfilled {PUBLISHED_AT_FIELD} on {backfilled} points")
+    # Indexed last: the index is what marks the migration done, so an
+    # interrupted backfill resumes (from the points still missing it) next start
+    client.create_payload_index(
+        collection_name=QDRANT_COLLECTION_NAME,
+        field_name=PUBLISHED_AT_FIELD,
+        field_schema=models.PayloadSchemaType.INTEGER
+    )
+
+
+def time_filter(since=None, until=None):
+    """Qdrant filter restricting points to a publish-time window (unix seconds), or None"""
+    if since is None and until is None:
+        return None
+    return models.Filter(must=[
+        models.FieldCondition(key=PUBLISHED_AT_FIELD, range=models.Range(gte=since, lte=until))
+    ])
+
 
 def ensure_collection_exists():
     """Ensure Qdrant collection exists with proper configuration"""
+    global _collection_ready
     try:
         # Check if collection already exists
         collections = client.get_collections().collections
         if any(c.name == QDRANT_COLLECTION_NAME for c in collections):
             print(f"Collection {QDRANT_COLLECTION_NAME} already exists")
+            if QDRANT_URL != ":memory:":
+                # Local mode has no quantization or on-disk storage to migrate
+                try:
+                    migrate_collection_config()
+                except Exception as e:
+                    print(f"Error migrating collection config: {str(e)}")
+            try:
+                ensure_doc_id_index()
+            except Exception as e:
+                print(f"Error adding doc_id index: {str(e)}")
+            try:
+                ensure_published_at_index()
+            except Exception as e:
+                print(f"Error adding {PUBLISHED_AT_FIELD} index: {str(e)}")
+            refresh_collection_meta()
+            _collection_ready = True
             return True
 
         # Create collection using Qdrant models
@@ -33,8 +316,10 @@ def ensure_collection_exists():
             collection_name=QDRANT_COLLECTION_NAME,
             vectors_config=models.VectorParams(
                 size=VECTOR_SIZE,
-                distance=models.Distance.COSINE
+                distance=models.Distance.COSINE,
+                on_disk=QDRANT_VECTORS_ON_DISK
             ),
+            quantization_config=quantization_config(),
             hnsw_config=models.HnswConfigDiff(
                 m=16,
                 ef_construct=100,
@@ -43,12 +328,27 @@ def ensure_collection_exists():
             optimizers_config=models.OptimizersConfigDiff(
                 default_segment_number=2,
                 max_optimization_threads=2,
-                indexing_threshold=0,
+                indexing_threshold=QDRANT_INDEXING_THRESHOLD,
                 memmap_threshold=0
             ),
+            sparse_vectors_config={
+                SPARSE_VECTOR_NAME: models.SparseVectorParams(modifier=models.Modifier.IDF)
+            },
             on_disk_payload=True
         )
+        client.create_payload_index(
+            collection_name=QDRANT_COLLECTION_NAME,
+            field_name="doc_id",
+            field_schema=models.PayloadSchemaType.KEYWORD
+        )
+        client.create_payload_index(
+            collection_name=QDRANT_COLLECTION_NAME,
+            field_name=PUBLISHED_AT_FIELD,
+            field_schema=models.PayloadSchemaType.INTEGER
+        )
         print(f"Successfully created collection {QDRANT_COLLECTION_NAME}")
+        refresh_collection_meta()
+        _collection_ready = True
         return True
 
     except Exception as e:
@@ -79,7 +379,7 @@ def get_collection_info():
             if sample:
                 print("\nSample point structure:")
                 point = sample[0]
-                print(f"Vector size in sample: {len(point.vector)}")
+                print(f"Vector size in sample: {len(dense_vector(point.vector) or [])}")
                 print(f"Payload keys: {list(point.payload.keys())}")
                 print(f"Sample title: {point.payload.get('title', 'No title')}")
                 print(f"Sample content length: {len(point.payload.get('content', ''))} chars")
@@ -95,84 +395,287 @@ def get_collection_info():
         return None
 
 
+def point_id(doc):
+    """Content-addressed point ID: the same chunk of the same article always maps to the same point"""
+    key = f"{doc.get('doc_id') or doc['title']}\0{doc['content']}"
+    return str(uuid.UUID(hashlib.sha256(key.encode('utf-8')).hexdigest()[:32]))
+
+
+def delete_stale_points(current_points, batch_size=256):
+    """
+    Delete every point of the given articles (by payload doc_id) that isn't
+    in its current set of point IDs: chunks of a previous version of the
+    article or legacy points stored under other IDs. current_points maps
+    doc_id -> point IDs; call it after those points are upserted so the
+    articles stay searchable throughout.
+    """
+    doc_ids = list(current_points)
+    for start in range(0, len(doc_ids), batch_size):
+        batch = doc_ids[start:start + batch_size]
+        # Point IDs are derived from the doc_id, so pooling the keep lists is safe
+        keep_ids = [pid for doc_id in batch for pid in current_points[doc_id]]
+        client.delete(
+            collection_name=QDRANT_COLLECTION_NAME,
+            points_selector=models.FilterSelector(
+                filter=models.Filter(
+                    must=[models.FieldCondition(key="doc_id", match=models.MatchAny(any=batch))],
+                    must_not=[models.HasIdCondition(has_id=keep_ids)]
+                )
+            )
+        )
+    invalidate_collection_meta()
+
+
+def point_payload(doc):
+    """Payload stored with each chunk point"""
+    return {
+        "doc_id": doc.get("doc_id", ""),
+        "doc_idx": doc["doc_idx"],
+        "chunk_idx": doc["chunk_idx"],
+        "title": doc["title"],
+        "date": doc["date"],
+        PUBLISHED_AT_FIELD: published_timestamp(doc["date"]),
+        "content": doc["content"],
+        "url": doc.get("url", "")
+    }
+
+
+def _to_point(doc):
+    vector = doc["embedding"]
+    if _collection_has_sparse:
+        indices, values = document_sparse_vector(doc["content"])
+        vector = {
+            "": doc["embedding"],
+            SPARSE_VECTOR_NAME: models.SparseVector(indices=indices, values=values)
+        }
+    return models.PointStruct(
+        id=point_id(doc),
+        vector=vector,
+        payload=point_payload(doc)
+    )
+
+
 def insert_documents(documents):
     """Insert documents as vector points into Qdrant"""
-    ensure_collection_exists()
+    if not _collection_ready:
+        ensure_collection_exists()
 
-    points = []
-    for doc in documents:
-        point_id = doc["doc_idx"] * 10000 + doc["chunk_idx"]
-        point = models.PointStruct(
-            id=point_id,
-            vector=doc["embedding"],
-            payload={
-                "doc_idx": doc["doc_idx"],
-                "chunk_idx": doc["chunk_idx"],
-                "title": doc["title"],
-                "date": doc["date"],
-                "content": doc["content"],
-                "url": doc.get("url", "")
-            }
-        )
-        points.append(point)
+    points = [_to_point(doc) for doc in documents]
 
     if points:
         print(f"Inserting {len(points)} points into Qdrant")
         client.upsert(collection_name=QDRANT_COLLECTION_NAME, points=points)
+        refresh_collection_meta()
 
 
-def search_documents(query_vector, top_k=15):
-    """Search for similar documents in Qdrant collection."""
+def _get_bulk_client():
+    global _bulk_client
+    if not QDRANT_PREFER_GRPC or QDRANT_URL == ":memory:":
+        return client
+    if _bulk_client is None:
+        _bulk_client = QdrantClient(url=QDRANT_URL, api_key=QDRANT_API_KEY, prefer_grpc=True, timeout=60.0)
+    return _bulk_client
+
+
+def _upsert_batch(qdrant, points, wait):
     try:
-        collection_info = client.get_collection(QDRANT_COLLECTION_NAME)
+        qdrant.upsert(collection_name=QDRANT_COLLECTION_NAME, points=points, wait=wait)
+        return len(points)
+    except Exception as e:
+        print(f"Error upserting batch of {len(points)} points: {str(e)}")
+        return 0
+
+
+def bulk_insert_documents(documents, batch_size=None, parallel=None, wait=True):
+    """
+    Bulk-load documents from any iterable without materializing them all.
+
+    Points are upserted in batches of batch_size with up to parallel requests
+    in flight. With wait=False Qdrant acknowledges each batch on receipt
+    instead of after it is applied. Set QDRANT_PREFER_GRPC=true to load over
+    gRPC. Returns the number of points acknowledged.
+    """
+    batch_size = batch_size or QDRANT_BULK_BATCH_SIZE
+    parallel = max(parallel or QDRANT_BULK_PARALLEL, 1)
+    if not _collection_ready:
+        ensure_collection_exists()
+
+    qdrant = _get_bulk_client()
+    points = map(_to_point, documents)
+    inserted = 0
+    in_flight = set()
+    with futures.ThreadPoolExecutor(max_workers=parallel) as pool:
+        while True:
+            batch = list(itertools.islice(points, batch_size))
+            if not batch:
+                break
+            # Bound in-flight batches so memory stays at parallel * batch_size points
+            if len(in_flight) >= parallel:
+                done, in_flight = futures.wait(in_flight, return_when=futures.FIRST_COMPLETED)
+                inserted += sum(f.result() for f in done)
+            in_flight.add(pool.submit(_upsert_batch, qdrant, batch, wait))
+        inserted += sum(f.result() for f in in_flight)
+
+    print(f"Bulk inserted {inserted} points into Qdrant")
+    invalidate_collection_meta()
+    return inserted
+
+
+def _search_status(status, points=None):
+    return {
+        "result": {"points": points or []},
+        "status": status,
+        "time": 0
+    }
+
+
+def dense_vector(vector):
+    """The dense vector of a point, whether stored unnamed alone or next to named sparse vectors"""
+    if isinstance(vector, dict):
+        return vector.get("")
+    return vector
 
-        if len(query_vector) != collection_info.config.params.vectors.size:
-            print(f"Query vector size mismatch: expected {collection_info.config.params.vectors.size}, got {len(query_vector)}")
-            return {
-                "result": {"points": []},
-                "status": "vector_size_mismatch",
-                "time": 0
-            }
 
-        count = client.count(QDRANT_COLLECTION_NAME)
-        if count.count == 0:
-            print("Collection exists but has no points")
-            return {
-                "result": {"points": []},
-                "status": "empty_collection",
-                "time": 0
+def _format_hits(search_response):
+    points = []
+    for hit in search_response:
+        try:
+            point = {
+                "id": str(hit.id),
+                "score": float(hit.score),
+                "payload": dict(hit.payload)
             }
+            if hit.vector is not None:
+                point["vector"] = dense_vector(hit.vector)
+            points.append(point)
+        except Exception as e:
+            print(f"Error converting hit: {str(e)}")
+
+    print(f"Found {len(points)} matching documents")
+    return points
+
+
+def _check_meta(query_vector, meta):
+    """Return a non-ok search status for the cached metadata, or None to proceed"""
+    expected = meta["vector_size"]
+    if len(query_vector) != expected:
+        print(f"Query vector size mismatch: expected {expected}, got {len(query_vector)}")
+        return _search_status("vector_size_mismatch")
+    if meta["points_count"] == 0:
+        print("Collection exists but has no points")
+        return _search_status("empty_collection")
+    return None
+
+
+def _dense_search_kwargs(query_vector, top_k, with_vectors, params, query_filter):
+    """Request shared by the sync and async dense searches"""
+    return dict(
+        collection_name=QDRANT_COLLECTION_NAME,
+        query_vector=query_vector,
+        limit=top_k,
+        with_payload=True,
+        with_vectors=with_vectors,
+        search_params=params or search_params(),
+        query_filter=query_filter
+    )
+
+
+def search_documents(query_vector, top_k=15, with_vectors=False, params=None, query_filter=None):
+    """
+    Search for similar documents in Qdrant collection. params overrides the
+    configured search_params() for this query; query_filter (e.g. from
+    time_filter) is applied inside Qdrant. The app searches through
+    search_documents_async; this blocking form is for scripts and benchmarks.
+    """
+    for attempt in range(2):
+        try:
+            meta = _cached_collection_meta() or refresh_collection_meta()
+            status = _check_meta(query_vector, meta)
+            if status:
+                return status
+            search_response = client.search(
+                **_dense_search_kwargs(query_vector, top_k, with_vectors, params, query_filter)
+            )
+            return _search_status("ok", _format_hits(search_response))
+
+        except Exception as e:
+            print(f"Error in search_documents: {str(e)}")
+            # Metadata may be stale (collection recreated, etc.): revalidate once
+            invalidate_collection_meta()
+
+    return _search_status("error")
+
+
+async def search_documents_async(query_vector, top_k=15, with_vectors=False, params=None, query_filter=None):
+    """Async variant of search_documents using the non-blocking Qdrant client."""
+    for attempt in range(2):
+        try:
+            meta = _cached_collection_meta() or await refresh_collection_meta_async()
+            status = _check_meta(query_vector, meta)
+            if status:
+                return status
+            search_response = await async_client.search(
+                **_dense_search_kwargs(query_vector, top_k, with_vectors, params, query_filter)
+            )
+            return _search_status("ok", _format_hits(search_response))
+
+        except Exception as e:
+            print(f"Error in search_documents_async: {str(e)}")
+            # Metadata may be stale (collection recreated, etc.): revalidate once
+            invalidate_collection_meta()
+
+    return _search_status("error")
 
-        print(f"Searching in collection with {count.count} points")
-        search_response = client.search(
+
+async def retrieve_vectors_async(point_ids):
+    """Dense vectors of the given points by id (missing points are left out)"""
+    if not point_ids:
+        return {}
+    try:
+        records = await async_client.retrieve(
             collection_name=QDRANT_COLLECTION_NAME,
-            query_vector=query_vector,
-            limit=top_k,
-            with_payload=True
+            ids=list(point_ids),
+            with_payload=False,
+            with_vectors=True
         )
+        return {str(record.id): dense_vector(record.vector) for record in records}
+    except Exception as e:
+        print(f"Error in retrieve_vectors_async: {str(e)}")
+        return {}
 
-        points = []
-        for hit in search_response:
-            try:
-                points.append({
-                    "id": str(hit.id),
-                    "score": float(hit.score),
-                    "payload": dict(hit.payload)
-                })
-            except Exception as e:
-                print(f"Error converting hit: {str(e)}")
 
-        print(f"Found {len(points)} matching documents")
-        return {
-            "result": {"points": points},
-            "status": "ok",
-            "time": 0
-        }
+async def search_sparse_async(query_text, top_k=15, with_vectors=False, query_filter=None):
+    """
+    Lexical (BM25) search over the sparse vectors. Returns the same shape as
+    search_documents; status is "no_sparse_index" for collections created
+    before sparse vectors were added.
+    """
+    indices, values = query_sparse_vector(query_text)
+    if not indices:
+        return _search_status("ok")
+    for attempt in range(2):
+        try:
+            meta = _cached_collection_meta() or await refresh_collection_meta_async()
+            if meta["points_count"] == 0:
+                return _search_status("empty_collection")
+            if not meta["has_sparse"]:
+                return _search_status("no_sparse_index")
 
-    except Exception as e:
-        print(f"Error in search_documents: {str(e)}")
-        return {
-            "result": {"points": []},
-            "status": "error",
-            "time": 0
-        }
+            search_response = await async_client.search(
+                collection_name=QDRANT_COLLECTION_NAME,
+                query_vector=models.NamedSparseVector(
+                    name=SPARSE_VECTOR_NAME,
+                    vector=models.SparseVector(indices=indices, values=values)
+                ),
+                limit=top_k,
+                with_payload=True,
+                with_vectors=with_vectors,
+                query_filter=query_filter
+            )
+            return _search_status("ok", _format_hits(search_response))
+
+        except Exception as e:
+            print(f"Error in search_sparse_async: {str(e)}")
+            invalidate_collection_meta()
+
+    return _search_status("error")
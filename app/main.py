@@ -1,8 +1,17 @@
-from fastapi import FastAPI
+import time
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from app.routes import chat, session
 from app.services.gemini import initialize_gemini
-from app.db.vector_db import ensure_collection_exists, get_collection_info
+from app.services.embeddings import close_async_client
+from app.db.sql import close_pool, init_db
+from app.db.redis_cache import close_async_client as close_async_redis
+from app.services.write_behind import start_flusher, stop_flusher
+from app.db.vector_db import ensure_collection_exists, get_collection_info, async_client
+from app.services.metrics import (
+    HTTP_REQUEST_SECONDS, SERVER_TIMING, render_metrics, server_timing_header, start_request_timings
+)
 from dotenv import load_dotenv
 import os
 
@@ -33,6 +42,25 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """Request latency histogram by route template, plus optional Server-Timing header"""
+    timings = start_request_timings() if SERVER_TIMING else None
+    started = time.perf_counter()
+    response = await call_next(request)
+    elapsed = time.perf_counter() - started
+    route = request.scope.get("route")
+    HTTP_REQUEST_SECONDS.observe(
+        elapsed,
+        method=request.method,
+        route=getattr(route, "path", "unmatched"),
+        status=str(response.status_code)
+    )
+    if timings is not None:
+        # Streaming responses only report spans finished before the headers were sent
+        response.headers["Server-Timing"] = server_timing_header(timings, elapsed)
+    return response
+
 app.include_router(session.router, prefix="/api/session", tags=["session"])
 app.include_router(chat.router, prefix="/api", tags=["chat"])
 
@@ -41,6 +69,11 @@ async def ping():
     """Endpoint to check if backend is awake"""
     return {"status": "ok", "message": "Backend is awake"}
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus metrics for this worker process"""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
 @app.on_event("startup")
 async def startup_event():
     """Initialize services on startup"""
@@ -51,6 +84,16 @@ async def startup_event():
         initialize_gemini()
         print("Gemini model initialized")
         
+        # Create tables and apply pending schema migrations
+        try:
+            init_db()
+            print("Database schema up to date")
+        except Exception as e:
+            print(f"Error applying database migrations: {str(e)}")
+        
+        # Background PostgreSQL writer for SESSION_WRITE_BEHIND mode
+        start_flusher()
+        
         # Ensure Qdrant collection exists
         if not ensure_collection_exists():
             print("Failed to initialize Qdrant collection")
@@ -67,6 +110,14 @@ async def startup_event():
         # Don't raise the error, just log it
         print(f"Application will continue running with limited functionality")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Release async clients on shutdown"""
+    await stop_flusher()
+    await close_async_client()
+    await async_client.close()
+    await close_async_redis()
+    close_pool()
 
 
 @app.get("/")
@@ -1,9 +1,21 @@
+import asyncio
+import hashlib
+import json
+import time
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import List, Dict, Optional
 
 from ..services.search import search_articles
-from ..services.gemini import generate_final_answer
+from ..services.gemini import generate_final_answer_async, stream_final_answer_async, FALLBACK_ANSWERS
+from ..services.embeddings import generate_query_embedding_async
+from ..services.embedding_cache import get_cache_stats
+from ..services.answer_cache import lookup_answer, store_answer, get_answer_cache_stats
+from ..services.conversation import load_memory, format_memory, rewrite_query
+from ..services.single_flight import coalesce_key, single_flight, get_single_flight_stats
+from ..services.metrics import span, CACHE_REQUESTS
+from .session import load_session_messages
 import os
 from dotenv import load_dotenv
 
@@ -11,14 +23,107 @@ load_dotenv()
 
 router = APIRouter()
 
+# Articles retrieved per chat turn
+CHAT_TOP_K = 5
+
 class ChatRequest(BaseModel):
     message: str
     session_id: Optional[str] = None
+    # Only use articles published within this many hours
+    max_age_hours: Optional[float] = None
+
+    def since(self) -> Optional[float]:
+        return time.time() - self.max_age_hours * 3600 if self.max_age_hours else None
 
 class ChatResponse(BaseModel):
     answer: str
     news_context: List[Dict] = []
 
+def format_news_context(articles: List[Dict]) -> List[Dict]:
+    """Format retrieved articles as the news_context returned to clients"""
+    news_context = []
+    for article in articles:
+        try:
+            news_context.append({
+                "title": str(article.get("title", "No title")),
+                "content": str(article.get("content", "No content")),
+                "url": str(article.get("url", "")),
+                "relevance_score": float(article.get("score", 0.0))
+            })
+        except Exception as e:
+            print(f"Error formatting article: {str(e)}")
+            continue
+    return news_context
+
+async def prepare_query(request: ChatRequest):
+    """
+    Resolve the session's conversation memory. Returns (search_query,
+    conversation): the follow-up rewritten as a standalone query for
+    retrieval, and the bounded conversation text for the prompt.
+    """
+    if not request.session_id:
+        return request.message, None
+    try:
+        messages = await asyncio.to_thread(load_session_messages, request.session_id)
+        if not messages:
+            return request.message, None
+        memory = await load_memory(request.session_id, messages, request.message)
+        search_query = await rewrite_query(request.message, memory)
+        return search_query, format_memory(memory) or None
+    except Exception as e:
+        print(f"Error loading conversation memory: {str(e)}")
+        return request.message, None
+
+def sse_event(event: str, data) -> str:
+    """Encode one server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+async def answer_query(request: ChatRequest, search_query: str, conversation: Optional[str]) -> Dict:
+    """Retrieve, then answer from the answer cache or Gemini; returns ChatResponse fields"""
+    # Search for relevant articles asynchronously
+    with span("retrieval"):
+        articles = await search_articles(search_query, top_k=CHAT_TOP_K, since=request.since())
+    print(f"Found {len(articles)} relevant articles")
+    
+    if not articles:
+        print("No relevant articles found")
+        return {
+            "answer": "I couldn't find any relevant news articles to answer your question.",
+            "news_context": []
+        }
+    
+    # Reuse an answer for a semantically similar question over the same articles
+    # (the query embedding is served from the embedding cache at this point).
+    # Answers that depend on earlier turns are neither reused nor stored.
+    query_embedding = article_ids = None
+    if not conversation:
+        query_embedding = await generate_query_embedding_async(search_query)
+        article_ids = [article.get("id") for article in articles if article.get("id")]
+        with span("answer_cache"):
+            cached = await asyncio.to_thread(lookup_answer, query_embedding, article_ids)
+        CACHE_REQUESTS.inc(cache="answer", result="hit" if cached else "miss")
+        if cached:
+            return cached
+    
+    # Generate answer using Gemini
+    generation_start = time.perf_counter()
+    answer = await generate_final_answer_async(request.message, articles, conversation)
+    generation_seconds = time.perf_counter() - generation_start
+    if not answer:
+        print("No answer generated")
+        return {
+            "answer": "I apologize, but I couldn't generate a response based on the available information.",
+            "news_context": []
+        }
+    
+    # Format news context for response
+    news_context = format_news_context(articles)
+    
+    if query_embedding and answer not in FALLBACK_ANSWERS:
+        store_answer(query_embedding, article_ids, answer, news_context, generation_seconds)
+    
+    return {"answer": answer, "news_context": news_context}
+
 @router.post("/chat", response_model=ChatResponse)
 async def chat(request: ChatRequest):
     """
@@ -26,44 +131,104 @@ async def chat(request: ChatRequest):
     """
     try:
         print(f"\nReceived chat request: {request.message}")
+        with span("conversation"):
+            search_query, conversation = await prepare_query(request)
         
-        # Search for relevant articles asynchronously
-        articles = await search_articles(request.message, top_k=5)
-        print(f"Found {len(articles)} relevant articles")
-        
-        if not articles:
-            print("No relevant articles found")
-            return ChatResponse(
-                answer="I couldn't find any relevant news articles to answer your question.",
-                news_context=[]
-            )
-        
-        # Generate answer using Gemini
-        answer = generate_final_answer(request.message, articles)
-        if not answer:
-            print("No answer generated")
-            return ChatResponse(
-                answer="I apologize, but I couldn't generate a response based on the available information.",
-                news_context=[]
-            )
-        
-        # Format news context for response
-        news_context = []
-        for article in articles:
-            try:
-                news_context.append({
-                    "title": str(article.get("title", "No title")),
-                    "content": str(article.get("content", "No content")),
-                    "url": str(article.get("url", "")),
-                    "relevance_score": float(article.get("score", 0.0))
-                })
-            except Exception as e:
-                print(f"Error formatting article: {str(e)}")
-                continue
-        
-        return ChatResponse(
-            answer=answer,
-            news_context=news_context
+        # Identical concurrent questions (same query, window and conversation)
+        # share one retrieval + generation
+        key = coalesce_key(
+            request.message,
+            search_query=search_query,
+            conversation=hashlib.sha1((conversation or "").encode('utf-8')).hexdigest(),
+            max_age_hours=request.max_age_hours,
+            top_k=CHAT_TOP_K
         )
+        result = await single_flight(key, lambda: answer_query(request, search_query, conversation))
+        return ChatResponse(**result)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """
+    Streaming variant of /chat using server-sent events.
+
+    Emits a `context` event with the retrieved news_context, then `token`
+    events with answer chunks as Gemini produces them, and a final `done`
+    event carrying timing metadata (milliseconds).
+    """
+    async def event_stream():
+        started = time.perf_counter()
+        try:
+            print(f"\nReceived streaming chat request: {request.message}")
+            with span("conversation"):
+                search_query, conversation = await prepare_query(request)
+            with span("retrieval"):
+                articles = await search_articles(search_query, top_k=CHAT_TOP_K, since=request.since())
+            retrieval_ms = (time.perf_counter() - started) * 1000
+
+            if not articles:
+                yield sse_event("context", {"news_context": []})
+                yield sse_event("token", {"text": "I couldn't find any relevant news articles to answer your question."})
+                yield sse_event("done", {"retrieval_ms": retrieval_ms, "total_ms": retrieval_ms, "cached": False})
+                return
+
+            news_context = format_news_context(articles)
+            # Same answer cache rules as /chat: only for questions without conversation
+            query_embedding = article_ids = cached = None
+            if not conversation:
+                query_embedding = await generate_query_embedding_async(search_query)
+                article_ids = [article.get("id") for article in articles if article.get("id")]
+                cached = await asyncio.to_thread(lookup_answer, query_embedding, article_ids)
+                CACHE_REQUESTS.inc(cache="answer", result="hit" if cached else "miss")
+            if cached:
+                yield sse_event("context", {"news_context": cached["news_context"]})
+                yield sse_event("token", {"text": cached["answer"]})
+                total_ms = (time.perf_counter() - started) * 1000
+                yield sse_event("done", {"retrieval_ms": retrieval_ms, "total_ms": total_ms, "cached": True})
+                return
+
+            yield sse_event("context", {"news_context": news_context})
+
+            generation_start = time.perf_counter()
+            first_token_ms = None
+            parts = []
+            async for text in stream_final_answer_async(request.message, articles, conversation):
+                if first_token_ms is None:
+                    first_token_ms = (time.perf_counter() - started) * 1000
+                parts.append(text)
+                yield sse_event("token", {"text": text})
+            generation_seconds = time.perf_counter() - generation_start
+
+            answer = "".join(parts).strip()
+            if query_embedding and answer and answer not in FALLBACK_ANSWERS:
+                store_answer(query_embedding, article_ids, answer, news_context, generation_seconds)
+
+            yield sse_event("done", {
+                "retrieval_ms": retrieval_ms,
+                "first_token_ms": first_token_ms,
+                "generation_ms": generation_seconds * 1000,
+                "total_ms": (time.perf_counter() - started) * 1000,
+                "cached": False
+            })
+        except Exception as e:
+            print(f"Error in streaming chat: {str(e)}")
+            yield sse_event("error", {"detail": str(e)})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get("/chat/cache_stats")
+async def chat_cache_stats():
+    """
+    Hit rate and latency saved by the semantic answer cache, plus query
+    embedding cache and request coalescing counts
+    """
+    return {
+        **get_answer_cache_stats(),
+        "embedding_cache": get_cache_stats(),
+        "single_flight": get_single_flight_stats()
+    }
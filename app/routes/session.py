@@ -1,10 +1,14 @@
 import uuid
-import json
 import redis
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query
 from pydantic import BaseModel
-from typing import List
-from ..db.sql import get_chat_history, save_chat_message, delete_chat_history
+from typing import List, Optional
+from ..db.redis_cache import binary_client as redis_client, serialize, deserialize
+from ..db.sql import (
+    get_chat_history_page, save_chat_message, delete_chat_history, get_message_ids, get_latest_message_id
+)
+from ..services.write_behind import SESSION_WRITE_BEHIND, enqueue_chat_message, enqueue_chat_reset
+from ..services.conversation import summary_key
 
 router = APIRouter()
 from dotenv import load_dotenv
@@ -12,108 +16,252 @@ import os
 
 load_dotenv()
 
-redis_client = redis.Redis(
-    host=os.getenv('REDIS_HOST', 'redis-17265.c212.ap-south-1-1.ec2.redns.redis-cloud.com'),
-    port=int(os.getenv('REDIS_PORT', '17265')),
-    db=os.getenv('REDIS_DB', 'default'),
-    password=os.getenv('REDIS_PASSWORD'),
-    decode_responses=True
-)
-
 class Message(BaseModel):
     role: str
     content: str
 
+class HistoryMessage(Message):
+    id: Optional[int] = None
+
 class ChatHistory(BaseModel):
-    messages: List[Message]
+    messages: List[HistoryMessage]
+    # Pass as ?before= to fetch the next older page; None when there are no more
+    next_cursor: Optional[int] = None
 
 class SessionResponse(BaseModel):
     session_id: str
 
-def get_messages_from_redis(session_id: str) -> List[dict]:
+# Session history is a Redis list of serialized messages holding a suffix of the
+# PostgreSQL history: either absent, or the latest SESSION_MAX_MESSAGES messages.
+# In write-behind mode a message for a cold session starts a "partial" list
+# (flagged by a second key) that the next read completes from PostgreSQL.
+SESSION_MAX_MESSAGES = int(os.getenv('SESSION_MAX_MESSAGES', '100'))
+SESSION_TTL = int(os.getenv('SESSION_TTL', '3600'))
+# Concurrent appends can reach the list out of id order (insert and append are
+# separate steps); reads fetch this many extra entries and re-sort by id
+SESSION_REORDER_SLACK = 8
+
+def _session_key(session_id: str) -> str:
+    return f'chat:list:{session_id}'
+
+def _partial_key(session_id: str) -> str:
+    return f'chat:list:{session_id}:partial'
+
+def _serialize(msg: dict) -> bytes:
+    entry = {"id": msg.get("id"), "role": msg["role"], "content": msg["content"]}
+    if msg.get("message_key"):
+        # Write-behind messages get their id only once flushed
+        entry["message_key"] = msg["message_key"]
+    return serialize(entry)
+
+def _in_id_order(messages: List[dict]) -> List[dict]:
+    """Sort by PostgreSQL id; messages without one (still queued) stay last, in list order"""
+    return sorted(messages, key=lambda m: (m.get("id") is None, m.get("id") or 0))
+
+def get_messages_from_redis(session_id: str, count: Optional[int] = None):
+    """
+    Read the newest count messages (all if None) in one round trip; a partial
+    list is completed from PostgreSQL first.
+
+    Returns (messages, list_length); messages are in chronological (id) order.
+    """
+    try:
+        key = _session_key(session_id)
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.lrange(key, -(count + SESSION_REORDER_SLACK) if count else 0, -1)
+        pipe.llen(key)
+        pipe.exists(_partial_key(session_id))
+        raw, length, partial = pipe.execute()
+        if partial:
+            messages = _complete_partial_list(session_id)
+            length = len(messages)
+        else:
+            messages = _in_id_order([deserialize(item) for item in raw])
+        return (messages[-count:] if count else messages), length
+    except Exception as e:
+        print(f"Redis error: {e}")
+        return [], 0
+
+def _complete_partial_list(session_id: str) -> List[dict]:
+    """
+    Merge a partial list with PostgreSQL (flushed history, then the cached
+    messages not flushed yet, matched by message_key) and store the result as
+    the complete list. The list is left alone if a message was appended
+    meanwhile; the merged history is returned either way.
+    """
+    key = _session_key(session_id)
+    with redis_client.pipeline(transaction=True) as pipe:
+        pipe.watch(key)
+        cached = [deserialize(item) for item in pipe.lrange(key, 0, -1)]
+        db_messages, _ = get_chat_history_page(session_id, SESSION_MAX_MESSAGES)
+        flushed = {m.get("message_key") for m in db_messages if m.get("message_key")}
+        merged = db_messages + [m for m in cached if m.get("message_key") not in flushed]
+        merged = merged[-SESSION_MAX_MESSAGES:]
+        try:
+            pipe.multi()
+            pipe.delete(key, _partial_key(session_id))
+            if merged:
+                pipe.rpush(key, *[_serialize(msg) for msg in merged])
+                pipe.expire(key, SESSION_TTL)
+            pipe.execute()
+        except redis.WatchError:
+            pass
+    return merged
+
+def start_partial_list(session_id: str, message: dict, expire_time: int = SESSION_TTL) -> None:
+    """
+    Cache a message for a session whose list has expired without reading
+    PostgreSQL: push it and flag the list partial until a read completes it.
+    """
     try:
-        messages_str = redis_client.get(f'chat:{session_id}')
-        if messages_str:
-            # No need to decode since decode_responses=True
-            return json.loads(messages_str)
-        return []
+        key = _session_key(session_id)
+        pipe = redis_client.pipeline(transaction=True)
+        pipe.rpush(key, _serialize(message))
+        pipe.ltrim(key, -SESSION_MAX_MESSAGES, -1)
+        pipe.expire(key, expire_time)
+        pipe.set(_partial_key(session_id), 1, ex=expire_time)
+        pipe.execute()
+    except Exception as e:
+        print(f"Redis error: {e}")
+
+def set_messages_in_redis(session_id: str, messages: List[dict], expire_time: int = SESSION_TTL) -> None:
+    """Replace the cached history with the given (chronological) messages"""
+    try:
+        key = _session_key(session_id)
+        pipe = redis_client.pipeline(transaction=True)
+        pipe.delete(key, _partial_key(session_id))
+        if messages:
+            pipe.rpush(key, *[_serialize(msg) for msg in messages[-SESSION_MAX_MESSAGES:]])
+            pipe.expire(key, expire_time)
+        pipe.execute()
     except Exception as e:
         print(f"Redis error: {e}")
-        return []
 
-def set_messages_in_redis(session_id: str, messages: List[dict], expire_time: int = 3600) -> None:
+def append_message_to_redis(session_id: str, message: dict, expire_time: int = SESSION_TTL) -> int:
+    """
+    Atomically append one message, trim to SESSION_MAX_MESSAGES and refresh the
+    TTL in a single round trip. Only appends to an existing list (RPUSHX), so a
+    list that expired is rebuilt from PostgreSQL instead of holding a partial tail.
+    Returns the new list length (0 if the list wasn't cached).
+    """
     try:
-        # Convert messages to a format that can be serialized
-        serializable_messages = [
-            {"role": msg["role"], "content": msg["content"]} 
-            for msg in messages
-        ]
-        redis_client.setex(
-            f'chat:{session_id}',
-            expire_time,
-            json.dumps(serializable_messages)
-        )
+        key = _session_key(session_id)
+        pipe = redis_client.pipeline(transaction=True)
+        pipe.rpushx(key, _serialize(message))
+        pipe.ltrim(key, -SESSION_MAX_MESSAGES, -1)
+        pipe.expire(key, expire_time)
+        # Keep a partial flag alive exactly as long as its list
+        pipe.expire(_partial_key(session_id), expire_time)
+        return pipe.execute()[0]
     except Exception as e:
         print(f"Redis error: {e}")
+        return 0
+
+def load_session_messages(session_id: str) -> List[dict]:
+    """Cached history for a session, rebuilt from PostgreSQL if the list expired"""
+    messages, length = get_messages_from_redis(session_id)
+    if length:
+        return messages
+    db_messages, _ = get_chat_history_page(session_id, SESSION_MAX_MESSAGES)
+    if db_messages:
+        set_messages_in_redis(session_id, db_messages)
+    return db_messages
+
+def _resolve_page_cursor(session_id: str, messages: List[dict]) -> Optional[int]:
+    """
+    Fill in ids of write-behind messages that have since been flushed and
+    return the cursor for the page before messages[0]. A message still queued
+    is newer than everything flushed (the queue is FIFO), so the older page
+    starts below the newest flushed row.
+    """
+    pending = [m["message_key"] for m in messages if m.get("id") is None and m.get("message_key")]
+    ids = get_message_ids(session_id, pending)
+    for m in messages:
+        if m.get("id") is None and m.get("message_key") in ids:
+            m["id"] = ids[m["message_key"]]
+    if messages[0].get("id") is not None:
+        return messages[0]["id"]
+    latest = get_latest_message_id(session_id)
+    return latest + 1 if latest is not None else None
 
 @router.get("/new_session/", response_model=SessionResponse)
 def create_session():
     session_id = str(uuid.uuid4())
-    set_messages_in_redis(session_id, [])  # Empty chat history
     return {"session_id": session_id}
 
 @router.get("/chat_history/{session_id}", response_model=ChatHistory)
-def get_session_history(session_id: str):
+def get_session_history(
+    session_id: str,
+    limit: int = Query(50, ge=1, le=500),
+    before: Optional[int] = Query(None, description="Cursor from a previous page's next_cursor")
+):
     try:
-        # Always get from PostgreSQL first for consistency
-        db_messages = get_chat_history(session_id)
-        if db_messages:
-            # Format messages
-            messages = [{
-                "role": msg["role"],
-                "content": msg["content"]
-            } for msg in db_messages]
-            # Update Redis cache
-            set_messages_in_redis(session_id, messages)
-            return {"messages": messages}
+        # Older pages come straight from PostgreSQL
+        if before is not None:
+            db_messages, next_cursor = get_chat_history_page(session_id, limit, before)
+            return {"messages": db_messages, "next_cursor": next_cursor}
         
-        # If no messages in PostgreSQL, try Redis as fallback
-        messages = get_messages_from_redis(session_id)
-        if messages:
-            # If found in Redis, persist to PostgreSQL
-            for msg in messages:
-                save_chat_message(session_id, msg["role"], msg["content"])
-            return {"messages": messages}
+        # Newest page from the Redis list when it can answer it completely
+        if limit <= SESSION_MAX_MESSAGES:
+            messages, length = get_messages_from_redis(session_id, limit)
+            # Entries without an id or message_key can't be placed in PostgreSQL
+            usable = messages and (messages[0].get("id") is not None or messages[0].get("message_key"))
+            if usable and (len(messages) == limit or length < SESSION_MAX_MESSAGES):
+                next_cursor = _resolve_page_cursor(session_id, messages) if len(messages) == limit else None
+                return {"messages": messages, "next_cursor": next_cursor}
         
-        # No messages found anywhere
-        return {"messages": []}
+        # Otherwise read PostgreSQL and rebuild the Redis list from it
+        fetch = max(limit, SESSION_MAX_MESSAGES)
+        db_messages, db_cursor = get_chat_history_page(session_id, fetch)
+        if not db_messages:
+            return {"messages": []}
+        set_messages_in_redis(session_id, db_messages)
+        messages = db_messages[-limit:]
+        if len(db_messages) > limit:
+            next_cursor = messages[0]["id"]
+        else:
+            next_cursor = db_cursor
+        return {"messages": messages, "next_cursor": next_cursor}
     except Exception as e:
         print(f"Error retrieving chat history: {e}")
         return {"messages": []}
 
 @router.post("/chat_message/{session_id}")
 def save_message(session_id: str, message: Message):
+    if SESSION_WRITE_BEHIND:
+        # Redis holds the hot copy; the background flusher writes PostgreSQL.
+        # The request path never touches PostgreSQL: a cold list is started
+        # partial and completed (de-duplicated by message_key) on read.
+        entry = {"role": message.role, "content": message.content, "message_key": str(uuid.uuid4())}
+        if not append_message_to_redis(session_id, entry):
+            start_partial_list(session_id, entry)
+        enqueue_chat_message(session_id, message.role, message.content, entry["message_key"])
+        return {"status": "success"}
+    
     # Save to PostgreSQL for persistence
-    save_chat_message(session_id, message.role, message.content)
+    message_id = save_chat_message(session_id, message.role, message.content)
     
-    # Update Redis for fast access
-    messages = get_messages_from_redis(session_id)
-    messages.append({
+    # Append to the Redis list for fast access
+    append_message_to_redis(session_id, {
+        "id": message_id,
         "role": message.role,
         "content": message.content
     })
-    set_messages_in_redis(session_id, messages)
     
     return {"status": "success"}
 
 @router.post("/reset/{session_id}")
 def reset_chat(session_id: str):
     try:
+        if SESSION_WRITE_BEHIND:
+            # Messages still queued would otherwise be flushed after the delete
+            enqueue_chat_reset(session_id)
+
         # Delete from PostgreSQL
         delete_chat_history(session_id)
         
-        # Delete from Redis
-        redis_client.delete(f'chat:{session_id}')
+        # Delete from Redis, including the rolling conversation summary
+        redis_client.delete(_session_key(session_id), _partial_key(session_id), summary_key(session_id))
         
         return {"status": "success", "message": "Chat history cleared"}
     except Exception as e:
@@ -0,0 +1,118 @@
+import os
+import threading
+import time
+from collections import deque
+from typing import List, Dict, Optional
+import numpy as np
+from dotenv import load_dotenv
+
+from ..db.redis_cache import get_counter, incr_cache
+
+load_dotenv()
+
+ANSWER_CACHE_SIZE = int(os.getenv('ANSWER_CACHE_SIZE', '256'))
+ANSWER_CACHE_TTL = int(os.getenv('ANSWER_CACHE_TTL', '3600'))
+ANSWER_CACHE_THRESHOLD = float(os.getenv('ANSWER_CACHE_THRESHOLD', '0.92'))
+# Fraction of the currently retrieved article IDs that must also back the cached answer
+ANSWER_CACHE_MIN_OVERLAP = float(os.getenv('ANSWER_CACHE_MIN_OVERLAP', '0.5'))
+
+# Bumped on every ingestion so all workers drop answers built on old data
+VERSION_KEY = "cache:answer:version"
+
+_entries = deque(maxlen=max(ANSWER_CACHE_SIZE, 1))
+_lock = threading.Lock()
+_local_version = None
+_stats = {"hits": 0, "misses": 0, "saved_seconds": 0.0}
+
+
+def _current_version():
+    return get_counter(VERSION_KEY)
+
+
+def _normalize(vector):
+    vec = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vec)
+    return vec / norm if norm else vec
+
+
+def _overlap(article_ids: List[str], cached_ids: frozenset) -> float:
+    if not article_ids:
+        return 0.0
+    return sum(1 for aid in article_ids if aid in cached_ids) / len(article_ids)
+
+
+def lookup_answer(query_embedding: List[float], article_ids: List[str]) -> Optional[Dict]:
+    """
+    Return a cached {"answer", "news_context"} for a semantically similar query
+    backed by overlapping articles, or None.
+    """
+    global _local_version
+    if ANSWER_CACHE_SIZE <= 0 or not query_embedding:
+        return None
+
+    started = time.perf_counter()
+    version = _current_version()
+    now = time.time()
+    query = _normalize(query_embedding)
+
+    with _lock:
+        if version != _local_version:
+            _entries.clear()
+            _local_version = version
+
+        best, best_score = None, ANSWER_CACHE_THRESHOLD
+        live = [
+            e for e in _entries
+            if e["version"] == version and now - e["created_at"] <= ANSWER_CACHE_TTL
+        ]
+        if live:
+            scores = np.stack([e["embedding"] for e in live]) @ query
+            for entry, score in zip(live, scores):
+                if score >= best_score and _overlap(article_ids, entry["article_ids"]) >= ANSWER_CACHE_MIN_OVERLAP:
+                    best, best_score = entry, float(score)
+
+        if best is None:
+            _stats["misses"] += 1
+            return None
+
+        _stats["hits"] += 1
+        _stats["saved_seconds"] += max(best["generation_seconds"] - (time.perf_counter() - started), 0.0)
+
+    print(f"Answer cache hit (similarity {best_score:.3f})")
+    return {"answer": best["answer"], "news_context": best["news_context"]}
+
+
+def store_answer(query_embedding: List[float], article_ids: List[str], answer: str,
+                 news_context: List[Dict], generation_seconds: float) -> None:
+    """Remember an answer for later semantically similar queries"""
+    if ANSWER_CACHE_SIZE <= 0 or not query_embedding:
+        return
+    with _lock:
+        _entries.append({
+            "embedding": _normalize(query_embedding),
+            "article_ids": frozenset(article_ids),
+            "answer": answer,
+            "news_context": news_context,
+            "generation_seconds": generation_seconds,
+            "version": _local_version,
+            "created_at": time.time()
+        })
+
+
+def invalidate_answer_cache() -> None:
+    """Drop cached answers here and, via the shared version key, in every worker"""
+    with _lock:
+        _entries.clear()
+    incr_cache(VERSION_KEY)
+
+
+def get_answer_cache_stats() -> Dict:
+    """Return hit rate and average latency saved per hit"""
+    hits, misses = _stats["hits"], _stats["misses"]
+    return {
+        "hits": hits,
+        "misses": misses,
+        "entries": len(_entries),
+        "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+        "avg_saved_seconds": _stats["saved_seconds"] / hits if hits else 0.0
+    }
@@ -0,0 +1,121 @@
+import hashlib
+import os
+import re
+from typing import Dict, Iterable, Iterator, List
+from dotenv import load_dotenv
+
+load_dotenv()
+
+CHUNK_MAX_TOKENS = int(os.getenv('CHUNK_MAX_TOKENS', '256'))
+CHUNK_OVERLAP_TOKENS = int(os.getenv('CHUNK_OVERLAP_TOKENS', '32'))
+
+# Same rough heuristic as gemini.count_tokens: 1 token ≈ 4 characters
+CHARS_PER_TOKEN = 4
+
+_PARAGRAPH_RE = re.compile(r'\n\s*\n')
+# Split on the whitespace after terminal punctuation, which may be followed by
+# up to two closing quotes/brackets; those stay with the sentence they close
+_SENTENCE_RE = re.compile(
+    r'(?:(?<=[.!?])|(?<=[.!?]["\')\]])|(?<=[.!?]["\')\]]{2}))\s+(?=["\'(\[]?[A-Z0-9])'
+)
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate token count using the chars-per-token heuristic"""
+    return len(text) // CHARS_PER_TOKEN
+
+
+def document_id(article: Dict) -> str:
+    """Stable identifier for an article, derived from its URL (or title and date)"""
+    key = article.get("url") or f"{article.get('title', '')}|{article.get('date', '')}"
+    return hashlib.sha1(str(key).encode('utf-8')).hexdigest()[:16]
+
+
+def content_hash(article: Dict) -> str:
+    """Hash of the article fields that affect its chunks and payload"""
+    key = "\0".join(str(article.get(field, "")) for field in ("title", "date", "url", "content"))
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+
+def split_sentences(text: str) -> List[str]:
+    """Split text into sentences, keeping paragraph boundaries as split points"""
+    sentences = []
+    for paragraph in _PARAGRAPH_RE.split(text):
+        paragraph = " ".join(paragraph.split())
+        if paragraph:
+            sentences.extend(s for s in _SENTENCE_RE.split(paragraph) if s)
+    return sentences
+
+
+def _split_long(sentence: str, max_chars: int) -> List[str]:
+    """
+    Hard-split a sentence that alone exceeds the budget, on word boundaries;
+    a single word longer than the budget (a URL, unspaced text) is cut into
+    max_chars pieces
+    """
+    pieces, current = [], []
+    size = 0
+    for word in sentence.split(" "):
+        while len(word) > max_chars:
+            if current:
+                pieces.append(" ".join(current))
+                current, size = [], 0
+            pieces.append(word[:max_chars])
+            word = word[max_chars:]
+        if current and size + len(word) + 1 > max_chars:
+            pieces.append(" ".join(current))
+            current, size = [], 0
+        current.append(word)
+        size += len(word) + 1
+    if current:
+        pieces.append(" ".join(current))
+    return pieces
+
+
+def chunk_text(text: str, max_tokens: int = None, overlap_tokens: int = None) -> Iterator[str]:
+    """
+    Yield chunks of text of at most max_tokens, split on sentence and paragraph
+    boundaries. Consecutive chunks share up to overlap_tokens of trailing sentences.
+    """
+    max_chars = (max_tokens or CHUNK_MAX_TOKENS) * CHARS_PER_TOKEN
+    overlap_chars = (CHUNK_OVERLAP_TOKENS if overlap_tokens is None else overlap_tokens) * CHARS_PER_TOKEN
+
+    window: List[str] = []
+    size = 0
+    for sentence in split_sentences(text):
+        for piece in (_split_long(sentence, max_chars) if len(sentence) > max_chars else [sentence]):
+            if window and size + len(piece) + 1 > max_chars:
+                yield " ".join(window)
+                # Carry trailing sentences over as overlap
+                carried, carried_size = [], 0
+                for prev in reversed(window):
+                    if carried_size + len(prev) + 1 > overlap_chars or carried_size + len(prev) + len(piece) + 2 > max_chars:
+                        break
+                    carried.insert(0, prev)
+                    carried_size += len(prev) + 1
+                window, size = carried, carried_size
+            window.append(piece)
+            size += len(piece) + 1
+    if window:
+        yield " ".join(window)
+
+
+def chunk_articles(articles: Iterable[Dict], max_tokens: int = None, overlap_tokens: int = None) -> Iterator[Dict]:
+    """
+    Stream chunks for a sequence of articles.
+
+    Each chunk carries the article metadata plus a stable (doc_id, chunk_idx)
+    pair; doc_idx is the article's position in the input sequence.
+    """
+    for doc_idx, article in enumerate(articles):
+        doc_id = document_id(article)
+        for chunk_idx, content in enumerate(chunk_text(article.get("content", ""), max_tokens, overlap_tokens)):
+            yield {
+                "doc_id": doc_id,
+                "doc_idx": doc_idx,
+                "chunk_idx": chunk_idx,
+                "title": article.get("title", ""),
+                "date": article.get("date", ""),
+                "url": article.get("url", ""),
+                "content": content
+            }
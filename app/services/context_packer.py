@@ -0,0 +1,105 @@
+import math
+import os
+from typing import Dict, List, Tuple
+from dotenv import load_dotenv
+
+from .chunking import CHARS_PER_TOKEN, estimate_tokens, split_sentences
+from .sparse import tokenize
+
+load_dotenv()
+
+# Total token budget for article context in the Gemini prompt
+CONTEXT_TOKEN_BUDGET = int(os.getenv('CONTEXT_TOKEN_BUDGET', '2000'))
+# Every included article gets at least this many tokens
+CONTEXT_MIN_ARTICLE_TOKENS = int(os.getenv('CONTEXT_MIN_ARTICLE_TOKENS', '80'))
+
+
+def allocate_budget(articles: List[Dict], budget: int) -> List[int]:
+    """
+    Split the budget across articles in proportion to relevance score, with a
+    floor of CONTEXT_MIN_ARTICLE_TOKENS. Budget an article can't use (it is
+    shorter than its share) is handed to the next articles in rank order.
+    """
+    if not articles:
+        return []
+    if budget <= 0:
+        # Nothing fits (e.g. titles alone used up the budget)
+        return [0] * len(articles)
+    scores = [max(float(a.get('score', 0.0)), 1e-6) for a in articles]
+    total = sum(scores)
+    shares = [max(CONTEXT_MIN_ARTICLE_TOKENS, int(budget * s / total)) for s in scores]
+    # Floors can push the sum over budget: scale back down
+    overflow = sum(shares) / budget
+    if overflow > 1:
+        shares = [int(share / overflow) for share in shares]
+
+    needs = [estimate_tokens(a.get('content', '')) for a in articles]
+    allocation, spare = [], 0
+    for share, need in zip(shares, needs):
+        share += spare
+        allocation.append(min(share, need))
+        spare = share - allocation[-1]
+    return allocation
+
+
+def _sentence_scores(sentences: List[str], query_terms: set) -> List[float]:
+    """Query-term overlap, length-normalized, with a mild preference for leading sentences"""
+    scores = []
+    for position, sentence in enumerate(sentences):
+        terms = tokenize(sentence)
+        overlap = sum(1 for term in terms if term in query_terms)
+        score = overlap / math.sqrt(len(terms)) if terms else 0.0
+        scores.append(score + 0.1 / (1 + position))
+    return scores
+
+
+def trim_to_budget(text: str, query_terms: set, max_tokens: int) -> str:
+    """
+    Keep the most query-relevant sentences that fit max_tokens, in original
+    order. When not even one fits, the best one is cut to max_tokens at a word
+    boundary.
+    """
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    sentences = split_sentences(text)
+    scores = _sentence_scores(sentences, query_terms)
+    ranked = sorted(range(len(sentences)), key=lambda i: scores[i], reverse=True)
+    keep, used = set(), 0
+    for index in ranked:
+        cost = estimate_tokens(sentences[index]) + 1
+        if used + cost > max_tokens:
+            continue
+        keep.add(index)
+        used += cost
+    if not keep and ranked and max_tokens > 0:
+        best = sentences[ranked[0]]
+        cut = best[:max_tokens * CHARS_PER_TOKEN]
+        if " " in cut and not best[len(cut):].startswith(" "):
+            cut = cut.rsplit(" ", 1)[0]
+        return cut.rstrip()
+    return " ".join(sentences[i] for i in sorted(keep))
+
+
+def pack_context(query: str, articles: List[Dict], budget: int = None) -> Tuple[List[Dict], int]:
+    """
+    Fit retrieved articles into the token budget. Returns the packed articles
+    (content trimmed to their allocation; articles left empty are dropped) and
+    the packed token count. Tokens an article's trimmed content doesn't use
+    are added to the next article's allocation.
+    """
+    budget = budget or CONTEXT_TOKEN_BUDGET
+    query_terms = set(tokenize(query))
+    # Titles are always sent, so they come out of the budget first
+    title_tokens = sum(estimate_tokens(a.get('title', '')) + 1 for a in articles)
+    allocation = allocate_budget(articles, max(budget - title_tokens, 0))
+
+    packed, tokens, spare = [], 0, 0
+    for article, max_tokens in zip(articles, allocation):
+        max_tokens += spare
+        content = trim_to_budget(article.get('content', ''), query_terms, max_tokens)
+        spare = max_tokens - estimate_tokens(content)
+        if not content:
+            continue
+        packed.append({**article, 'content': content})
+        tokens += estimate_tokens(article.get('title', '')) + estimate_tokens(content)
+    return packed, tokens
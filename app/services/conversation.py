@@ -0,0 +1,174 @@
+import asyncio
+import hashlib
+import os
+from typing import Dict, List, Optional
+from dotenv import load_dotenv
+
+from ..db.redis_cache import get_cache, set_cache
+from .chunking import CHARS_PER_TOKEN, estimate_tokens, split_sentences
+from .gemini import complete_text_async
+
+load_dotenv()
+
+# Newest messages sent verbatim; older ones are folded into the rolling summary
+CONVERSATION_RECENT_MESSAGES = int(os.getenv('CONVERSATION_RECENT_MESSAGES', '6'))
+# Fixed envelope for summary + recent turns in the prompt, whatever the session length
+CONVERSATION_TOKEN_BUDGET = int(os.getenv('CONVERSATION_TOKEN_BUDGET', '600'))
+CONVERSATION_SUMMARY_TOKENS = int(os.getenv('CONVERSATION_SUMMARY_TOKENS', '200'))
+# Older messages are summarized in batches of at least this many, so the summary
+# is not rewritten on every turn; until then they ride along with the recent turns
+CONVERSATION_SUMMARY_BATCH = int(os.getenv('CONVERSATION_SUMMARY_BATCH', '4'))
+CONVERSATION_SUMMARY_TTL = int(os.getenv('CONVERSATION_SUMMARY_TTL', '86400'))
+# Rewrite follow-up questions into standalone queries before embedding
+QUERY_REWRITE = os.getenv('QUERY_REWRITE', 'true').lower() == 'true'
+
+ROLE_LABELS = {"user": "User", "assistant": "Assistant"}
+
+
+def summary_key(session_id: str) -> str:
+    return f'chat:summary:{session_id}'
+
+
+def _fingerprint(message: Dict) -> str:
+    """
+    Identify a message by role and content; messages queued through the
+    write-behind have no database id yet, so ids can't be relied on.
+    """
+    raw = f"{message.get('role')}\n{message.get('content')}".encode('utf-8')
+    return hashlib.sha1(raw).hexdigest()[:16]
+
+
+def _truncate(text: str, max_tokens: int) -> str:
+    """Cut text to max_tokens on a word boundary"""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    cut = text[:max(max_tokens, 0) * CHARS_PER_TOKEN].rsplit(' ', 1)[0]
+    return f"{cut}..." if cut else ""
+
+
+def _format_turns(messages: List[Dict]) -> str:
+    return "\n".join(
+        f"{ROLE_LABELS.get(m.get('role'), m.get('role'))}: {m.get('content', '')}" for m in messages
+    )
+
+
+def _unsummarized_start(messages: List[Dict], last_fingerprint: Optional[str]) -> int:
+    """Index of the first message not yet folded into the summary"""
+    if last_fingerprint:
+        for index in range(len(messages) - 1, -1, -1):
+            if _fingerprint(messages[index]) == last_fingerprint:
+                return index + 1
+    return 0
+
+
+def _extractive_summary(summary: str, messages: List[Dict]) -> str:
+    """Fallback when Gemini is unavailable: keep the lead sentence of each turn"""
+    lines = [summary] if summary else []
+    for message in messages:
+        sentences = split_sentences(message.get('content', ''))
+        if sentences:
+            lines.append(f"{ROLE_LABELS.get(message.get('role'), message.get('role'))}: {sentences[0]}")
+    # Drop the oldest lines first
+    while len(lines) > 1 and estimate_tokens(" ".join(lines)) > CONVERSATION_SUMMARY_TOKENS:
+        lines.pop(0)
+    return _truncate(" ".join(lines), CONVERSATION_SUMMARY_TOKENS)
+
+
+async def _update_summary(summary: str, messages: List[Dict]) -> str:
+    """Fold messages into the running summary"""
+    words = CONVERSATION_SUMMARY_TOKENS * 3 // 4
+    prompt = f"""Update the running summary of a conversation about news with the new turns below.
+Keep the topics, entities and questions the user cares about. Use at most {words} words.
+Return only the updated summary.
+
+Current summary:
+{summary or "(none)"}
+
+New turns:
+{_format_turns(messages)}"""
+    updated = await complete_text_async(prompt)
+    if not updated:
+        return _extractive_summary(summary, messages)
+    return _truncate(updated, CONVERSATION_SUMMARY_TOKENS)
+
+
+async def load_memory(session_id: str, messages: List[Dict], query: str = None) -> Dict:
+    """
+    Build the bounded memory for a session from its cached history.
+
+    Returns {"summary": str, "recent": [...]}: a rolling summary of older
+    turns (cached in Redis and extended incrementally) plus the turns that
+    are sent verbatim. A trailing copy of the current query is ignored.
+    """
+    if messages and query and messages[-1].get('role') == 'user' and messages[-1].get('content') == query:
+        messages = messages[:-1]
+
+    key = summary_key(session_id)
+    state = await asyncio.to_thread(get_cache, key) or {}
+    summary = state.get("summary", "")
+
+    split = max(len(messages) - CONVERSATION_RECENT_MESSAGES, 0)
+    start = min(_unsummarized_start(messages[:split], state.get("last")), split)
+    older = messages[start:split]
+    if len(older) >= CONVERSATION_SUMMARY_BATCH:
+        summary = await _update_summary(summary, older)
+        await asyncio.to_thread(set_cache, key, {
+            "summary": summary,
+            "last": _fingerprint(older[-1])
+        }, CONVERSATION_SUMMARY_TTL)
+        older = []
+
+    return {"summary": summary, "recent": older + messages[split:]}
+
+
+def format_memory(memory: Dict, budget: int = None) -> str:
+    """
+    Render memory for the prompt within the token budget. The summary comes
+    first; the rest of the budget goes to turns, newest first, so the turns
+    that dropped off are always the oldest ones.
+    """
+    budget = budget or CONVERSATION_TOKEN_BUDGET
+    summary = _truncate(memory.get("summary", ""), min(CONVERSATION_SUMMARY_TOKENS, budget))
+    remaining = budget - estimate_tokens(summary)
+
+    turns = []
+    for message in reversed(memory.get("recent", [])):
+        if remaining <= 0:
+            break
+        # No single turn (typically a long answer) may take more than half of what's left
+        content = _truncate(message.get('content', ''), max(remaining // 2, 1))
+        if not content:
+            break
+        turns.append({"role": message.get('role'), "content": content})
+        remaining -= estimate_tokens(content) + 2
+    turns.reverse()
+
+    parts = []
+    if summary:
+        parts.append(f"Summary of earlier conversation: {summary}")
+    if turns:
+        parts.append(_format_turns(turns))
+    return "\n\n".join(parts)
+
+
+async def rewrite_query(query: str, memory: Dict) -> str:
+    """Rewrite a follow-up question into a standalone search query"""
+    if not QUERY_REWRITE or not (memory.get("summary") or memory.get("recent")):
+        return query
+    prompt = f"""Rewrite the user's latest question as a standalone news search query,
+resolving references like "it", "they" or "what about" using the conversation.
+If it is already standalone, return it unchanged. Return only the query.
+
+{format_memory(memory, CONVERSATION_TOKEN_BUDGET // 2)}
+
+Latest question: {query}"""
+    rewritten = await complete_text_async(prompt)
+    if not rewritten:
+        return query
+    rewritten = rewritten.splitlines()[0].strip().strip('"')
+    # Guard against the model answering instead of rewriting
+    if not rewritten or len(rewritten) > max(len(query) * 4, 200):
+        return query
+    if rewritten != query:
+        print(f"Rewrote query: {query!r} -> {rewritten!r}")
+    return rewritten
@@ -0,0 +1,115 @@
+import hashlib
+import os
+import threading
+from array import array
+from collections import OrderedDict
+from typing import List, Optional
+from dotenv import load_dotenv
+
+from ..db.redis_cache import get_bytes_async, set_bytes_async
+from .metrics import CACHE_REQUESTS
+
+load_dotenv()
+
+EMBEDDING_CACHE_SIZE = int(os.getenv('EMBEDDING_CACHE_SIZE', '1024'))
+EMBEDDING_CACHE_TTL = int(os.getenv('EMBEDDING_CACHE_TTL', '86400'))
+
+_lru = OrderedDict()
+_lock = threading.Lock()
+_stats = {"lru_hits": 0, "redis_hits": 0, "misses": 0}
+
+
+def normalize_query(text: str) -> str:
+    """Normalize query text so trivially different queries share a cache entry"""
+    return " ".join(text.split()).lower()
+
+
+def _cache_key(text: str, task: str) -> str:
+    return f"{task}:{normalize_query(text)}"
+
+
+def _redis_key(key: str) -> str:
+    return f"cache:embedding:{hashlib.sha1(key.encode('utf-8')).hexdigest()}"
+
+
+def encode_vector(vector: List[float]) -> bytes:
+    """Pack a vector as raw float32 (4 bytes per dimension, ~5x smaller than a JSON list)"""
+    packed = array('f', vector)
+    if packed.itemsize != 4:
+        raise ValueError("float32 array type not available")
+    return packed.tobytes()
+
+
+def decode_vector(encoded: bytes) -> List[float]:
+    """Inverse of encode_vector"""
+    packed = array('f')
+    packed.frombytes(encoded)
+    return packed.tolist()
+
+
+def _record(outcome: str) -> None:
+    """Count a lookup in both the local stats and the shared cache metric"""
+    _stats[outcome] += 1
+    CACHE_REQUESTS.inc(cache="embedding", result="miss" if outcome == "misses" else "hit")
+
+
+def _lru_get(key: str) -> Optional[List[float]]:
+    with _lock:
+        vector = _lru.get(key)
+        if vector is not None:
+            _lru.move_to_end(key)
+        return vector
+
+
+def _lru_set(key: str, vector: List[float]) -> None:
+    if EMBEDDING_CACHE_SIZE <= 0:
+        return
+    with _lock:
+        _lru[key] = vector
+        _lru.move_to_end(key)
+        while len(_lru) > EMBEDDING_CACHE_SIZE:
+            _lru.popitem(last=False)
+
+
+def _from_redis(key: str, encoded: Optional[bytes]) -> Optional[List[float]]:
+    if encoded:
+        try:
+            vector = decode_vector(encoded)
+            _lru_set(key, vector)
+            _record("redis_hits")
+            return vector
+        except Exception as e:
+            print(f"Error decoding cached embedding: {str(e)}")
+    _record("misses")
+    return None
+
+
+async def get_cached_embedding_async(text: str, task: str) -> Optional[List[float]]:
+    """Look up an embedding in the in-process LRU, then in Redis"""
+    key = _cache_key(text, task)
+    vector = _lru_get(key)
+    if vector is not None:
+        _record("lru_hits")
+        return vector
+    return _from_redis(key, await get_bytes_async(_redis_key(key)))
+
+
+async def set_cached_embedding_async(text: str, task: str, vector: List[float]) -> None:
+    """Store an embedding in both cache tiers"""
+    key = _cache_key(text, task)
+    _lru_set(key, vector)
+    try:
+        await set_bytes_async(_redis_key(key), encode_vector(vector), EMBEDDING_CACHE_TTL)
+    except Exception as e:
+        print(f"Error caching embedding: {str(e)}")
+
+
+def get_cache_stats() -> dict:
+    """Return hit/miss counters for the query embedding cache"""
+    lookups = sum(_stats.values())
+    hits = _stats["lru_hits"] + _stats["redis_hits"]
+    return {
+        **_stats,
+        "lru_size": len(_lru),
+        "hit_rate": hits / lookups if lookups else 0.0
+    }
@@ -1,193 +1,293 @@
+import asyncio
 import json
-import requests
+import random
+import httpx
 import os
 from dotenv import load_dotenv
+from .embedding_cache import get_cached_embedding_async, set_cached_embedding_async
+from .metrics import span, UPSTREAM_ERRORS
 
 load_dotenv()
 
 JINA_API_KEY = os.getenv('JINA_API_KEY')
+JINA_API_URL = os.getenv('JINA_API_URL', "https://api.jina.ai/v1/embeddings")
+JINA_TIMEOUT = float(os.getenv('JINA_TIMEOUT', '30'))
+VECTOR_SIZE = int(os.getenv('VECTOR_SIZE', '1024'))
+
+# Document embedding engine settings
+EMBED_CONCURRENCY = int(os.getenv('EMBED_CONCURRENCY', '4'))
+EMBED_BATCH_MAX_CHARS = int(os.getenv('EMBED_BATCH_MAX_CHARS', '60000'))
+EMBED_BATCH_MAX_ITEMS = int(os.getenv('EMBED_BATCH_MAX_ITEMS', '64'))
+EMBED_MAX_RETRIES = int(os.getenv('EMBED_MAX_RETRIES', '5'))
+EMBED_BACKOFF_BASE = float(os.getenv('EMBED_BACKOFF_BASE', '0.5'))
+EMBED_BACKOFF_MAX = float(os.getenv('EMBED_BACKOFF_MAX', '30'))
+
+# Shared async HTTP client, created lazily on the running event loop
+_async_client = None
+
+
+def _get_async_client():
+    """Return the shared httpx.AsyncClient used for Jina requests."""
+    global _async_client
+    if _async_client is None:
+        _async_client = httpx.AsyncClient(timeout=JINA_TIMEOUT)
+    return _async_client
+
+
+async def close_async_client():
+    """Close the shared async HTTP client (called on application shutdown)."""
+    global _async_client
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = None
+
+
+def _jina_headers():
+    return {
+        "Content-Type": "application/json",
+        "Authorization": f"Bearer {JINA_API_KEY}"
+    }
+
+
+def _query_request(query):
+    return {
+        "model": "jina-embeddings-v3",
+        "task": "retrieval.query",
+        "late_chunking": True,
+        "truncate": True,
+        "input": [query]
+    }
+
+
+def _parse_query_response(status_code, text, result):
+    """Extract the query embedding from a Jina API response, or None on failure."""
+    print(f"Jina API response status: {status_code}")
+    if status_code != 200:
+        print(f"Error response from Jina API: {text}")
+        return None
+
+    if not result.get('data'):
+        print("No embeddings data in response")
+        print(f"Response content: {result}")
+        return None
+
+    embedding = result['data'][0].get('embedding')
+    if not isinstance(embedding, list):
+        print(f"Invalid embedding type: {type(embedding)}")
+        return None
+
+    print(f"Successfully generated query embedding with size {len(embedding)}")
+    return embedding
+
+
+def _run_blocking(coro, name):
+    """Run coro to completion for a sync caller; refuses inside a running event loop"""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    coro.close()
+    raise RuntimeError(f"{name}() blocks and can't be called from a running event loop; "
+                       f"await {name}_async() instead")
 
 
 def generate_embeddings(texts, task="retrieval.document"):
     """Generate embeddings for documents. Uses document task type for better chunking."""
-    return _generate_embeddings(texts, task)
+    return _run_blocking(generate_embeddings_async(texts, task), "generate_embeddings")
+
 
 def generate_query_embedding(query):
+    """Blocking wrapper around generate_query_embedding_async, for scripts"""
+    async def embed_once():
+        try:
+            return await generate_query_embedding_async(query)
+        finally:
+            # The shared client belongs to the loop asyncio.run is about to close
+            await close_async_client()
+    return _run_blocking(embed_once(), "generate_query_embedding")
+
+async def generate_query_embedding_async(query):
     """Generate embedding for a search query. Uses query task type for better matching."""
     print(f"Generating embedding for query: {query}")
+    cached = await get_cached_embedding_async(query, "retrieval.query")
+    if cached is not None:
+        print("Query embedding served from cache")
+        return cached
+    if not JINA_API_KEY:
+        print("Error: JINA_API_KEY not found in environment variables")
+        return None
     try:
-        results = _generate_embeddings([query], task="retrieval.query")
-        if not results:
-            print("No results from _generate_embeddings")
-            return None
-        
-        # Check if results is a list and has at least one element.
-        if not isinstance(results, list) or not results:
-            print(f"Invalid result format: {results}")
-            return None
-
-        if not isinstance(results[0], dict) or 'embedding' not in results[0]:
-            print(f"Invalid result format: {results[0]}")
-            return None
-        
-        embedding = results[0]['embedding']
-        if not isinstance(embedding, list):
-            print(f"Invalid embedding type: {type(embedding)}")
-            return None
-        
-        print(f"Successfully generated query embedding with size {len(embedding)}")
+        with span("jina_query"):
+            response = await _get_async_client().post(
+                JINA_API_URL,
+                headers=_jina_headers(),
+                json=_query_request(query)
+            )
+        result = response.json() if response.status_code == 200 else {}
+        embedding = _parse_query_response(response.status_code, response.text, result)
+        if embedding is not None:
+            await set_cached_embedding_async(query, "retrieval.query", embedding)
+        else:
+            UPSTREAM_ERRORS.inc(service="jina")
         return embedding
     except Exception as e:
-        print(f"Error in generate_query_embedding: {str(e)}")
+        print(f"Error in generate_query_embedding_async: {str(e)}")
+        UPSTREAM_ERRORS.inc(service="jina")
         return None
 
-def _generate_embeddings(texts, task):
+def _text_content(text):
+    return text["content"] if isinstance(text, dict) else text
+
+
+def plan_batches(texts, max_chars=None, max_items=None):
+    """
+    Split texts into contiguous batches bounded by total characters and item count.
+
+    Returns a list of (start, end) index ranges into texts, in order. A single
+    text longer than max_chars gets a batch of its own (Jina truncates it).
+    """
+    max_chars = max_chars or EMBED_BATCH_MAX_CHARS
+    max_items = max_items or EMBED_BATCH_MAX_ITEMS
+    batches = []
+    start, chars = 0, 0
+    for i, text in enumerate(texts):
+        size = len(_text_content(text))
+        if i > start and (chars + size > max_chars or i - start >= max_items):
+            batches.append((start, i))
+            start, chars = i, 0
+        chars += size
+    if start < len(texts):
+        batches.append((start, len(texts)))
+    return batches
+
+
+def _retry_delay(attempt, response=None):
+    """Jittered exponential backoff, honoring Retry-After on 429/503 responses"""
+    if response is not None and response.status_code in (429, 503):
+        retry_after = response.headers.get("Retry-After")
+        if retry_after:
+            try:
+                return min(float(retry_after), EMBED_BACKOFF_MAX)
+            except ValueError:
+                pass
+    return random.uniform(0, min(EMBED_BACKOFF_MAX, EMBED_BACKOFF_BASE * (2 ** attempt)))
+
+
+def _is_retryable(status_code):
+    return status_code == 429 or status_code >= 500
+
+
+async def embed_batch(http, contents, task):
+    """Embed one batch, retrying transient failures. Returns a list of vectors or None."""
+    data = {
+        "model": "jina-embeddings-v3",
+        "task": task,
+        "late_chunking": True,
+        "truncate": True,
+        "input": contents
+    }
+    for attempt in range(EMBED_MAX_RETRIES + 1):
+        response = None
+        try:
+            with span("jina_batch"):
+                response = await http.post(JINA_API_URL, headers=_jina_headers(), json=data)
+            if response.status_code == 200:
+                result = response.json().get('data') or []
+                result = sorted(result, key=lambda item: item.get('index', 0))
+                if len(result) != len(contents):
+                    print(f"Jina returned {len(result)} embeddings for {len(contents)} inputs")
+                    return None
+                return [item.get('embedding') for item in result]
+            print(f"Error response from Jina API ({response.status_code}): {response.text[:200]}")
+            UPSTREAM_ERRORS.inc(service="jina")
+            if not _is_retryable(response.status_code):
+                print(f"Not retrying batch: status {response.status_code} is not retryable")
+                return None
+        except (httpx.HTTPError, ValueError) as e:
+            # Network errors, and 200 responses whose body isn't valid JSON
+            print(f"Jina request failed: {str(e)}")
+            UPSTREAM_ERRORS.inc(service="jina")
+
+        if attempt < EMBED_MAX_RETRIES:
+            delay = _retry_delay(attempt, response)
+            print(f"Retrying batch in {delay:.1f}s (attempt {attempt + 2} of {EMBED_MAX_RETRIES + 1})")
+            await asyncio.sleep(delay)
+    print(f"Giving up on batch after {EMBED_MAX_RETRIES + 1} attempts")
+    return None
+
+
+async def generate_embeddings_async(texts, task="retrieval.document"):
     """
     Generate embeddings for a list of texts using the Jina AI API.
 
+    Texts are grouped into batches by total character count, embedded with at
+    most EMBED_CONCURRENCY requests in flight, and retried with jittered
+    exponential backoff (honoring Retry-After on 429s).
+
     Args:
         texts (list): A list of strings or dictionaries (with "content" key) representing the texts to embed.
         task (str): The task type ("retrieval.document" or "retrieval.query").
 
     Returns:
-        list: A list of dictionaries, where each dictionary contains the embedding and related information.
-              Returns an empty list in case of errors or no texts.
-              Each dictionary has the following structure:
+        list: A list of dictionaries in input order, one per successfully embedded text:
               {
                   "embedding": list,  # The embedding vector (list of floats)
-                  "doc_idx": int,      # Index of the original document
-                  "chunk_idx": int,    # Index of the chunk within the document (always 0 for queries)
+                  "doc_idx": int,      # Index of the text in the input list
+                  "chunk_idx": int,    # Chunk index from the input metadata (0 if absent)
                   "title": str,        # Title of the document (if available)
                   "date": str,         # Date of the document (if available)
                   "content": str,      # Content of the chunk
                   "url": str           # URL of the document (if available)
               }
+              Texts whose batch still fails after all retries are logged and left out.
     """
     if not texts:
         print("No texts provided for embedding generation")
         return []
-    
-    print(f"Processing {len(texts)} documents for embedding generation")
-    
+
     if not JINA_API_KEY:
         print("Error: JINA_API_KEY not found in environment variables")
-        print("Available environment variables:")
-        # Attempt to print the key, but mask it for security
-        masked_key = '*' * len(JINA_API_KEY) if hasattr(JINA_API_KEY, 'JINA_API_KEY') and JINA_API_KEY else 'Not set'
-        print(f"JINA_API_KEY: {masked_key}")
         return []
 
-    url = "https://api.jina.ai/v1/embeddings"
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {JINA_API_KEY}"
-    }
-    
-    try:
-        # For queries, just process a single text
-        if task == "retrieval.query":
-            try:
-                print(f"Generating embedding for query: {texts[0][:100]}...")
-                data = {
-                    "model": "jina-embeddings-v3",
-                    "task": task,
-                    "late_chunking": True,
-                    "truncate": True,
-                    "input": texts
-                }
-                
-                print("Making request to Jina API...")
-                response = requests.post(url, headers=headers, json=data)
-                print(f"Jina API response status: {response.status_code}")
-                
-                if response.status_code != 200:
-                    print(f"Error response from Jina API: {response.text}")
-                    return []
-                
-                response.raise_for_status()
-                result = response.json()
-                
-                if not result.get('data'):
-                    print("No embeddings data in response")
-                    print(f"Response content: {result}")
-                    return []
-                
-                embedding = result['data'][0]['embedding']
-                print(f"Successfully generated embedding with size {len(embedding)}")
-                
-                return [{
-                    "embedding": embedding,
-                    "doc_idx": 0,
-                    "chunk_idx": 0
-                }]
-            except Exception as e:
-                print(f"Error generating query embedding: {str(e)}")
-                return []
-        
-        # For documents, process in batches
-        batch_size = 20  # Process 20 texts at a time for better performance
-        chunks_data = []
-        
-        try:
-            for i in range(0, len(texts), batch_size):
-                batch_texts = texts[i:i + batch_size]
-                # Convert texts to list of strings if they're dictionaries
-                batch_contents = [text["content"] if isinstance(text, dict) else text for text in batch_texts]
-                
-                data = {
-                    "model": "jina-embeddings-v3",
-                    "task": "retrieval.document", # Changed to retrieval.document
-                    "late_chunking": True,
-                    "truncate": True,
-                    "input": batch_contents
-                }
-                
-                print(f"Processing batch {i//batch_size + 1} of {(len(texts)-1)//batch_size + 1}")
-                response = requests.post(url, headers=headers, json=data)
-                
-                if response.status_code != 200:
-                    print(f"Error response from Jina API: {response.text}")
-                    continue  # Continue to the next batch
-                
-                response.raise_for_status()
-                result = response.json()
-                
-                if not result.get('data'):
-                    print("No embeddings data in response")
-                    continue  # Continue to the next batch
-                
-                # Process each document's embedding
-                for j, embedding_data in enumerate(result['data']):
-                    doc_idx = i + j
-                    original_text = batch_texts[j]
-                    metadata = original_text if isinstance(original_text, dict) else {}
-                    
-                    embedding = embedding_data.get('embedding')
-                    if not isinstance(embedding, list):
-                        print(f"Warning: Invalid embedding format for document {doc_idx}")
-                        continue
-                    
-                    # Check the embedding size
-                    if 'VECTOR_SIZE' in dir(config) and len(embedding) != config.VECTOR_SIZE:
-                        print(f"Warning: Incorrect embedding size {len(embedding)} for document {doc_idx}. Expected {config.VECTOR_SIZE if 'VECTOR_SIZE' in dir(config) else 'Unknown'}")
-                        continue
-                    
-                    chunks_data.append({
-                        "embedding": embedding,
-                        "doc_idx": doc_idx,
-                        "chunk_idx": j,
-                        "title": metadata.get("title", ""),
-                        "date": metadata.get("date", ""),
-                        "content": metadata.get("content", batch_contents[j]),
-                        "url": metadata.get("url", "")
-                    })
-            
-            print(f"Generated {len(chunks_data)} valid embeddings")
-            return chunks_data
-        except Exception as e:
-            print(f"Error in batch processing: {str(e)}")
-            return []
-            
-    except Exception as e:
-        print(f"Error in _generate_embeddings: {str(e)}")
-        return []
\ No newline at end of file
+    batches = plan_batches(texts)
+    print(f"Processing {len(texts)} documents in {len(batches)} batches "
+          f"(concurrency {EMBED_CONCURRENCY})")
+
+    semaphore = asyncio.Semaphore(max(EMBED_CONCURRENCY, 1))
+
+    async def run_batch(http, start, end):
+        async with semaphore:
+            contents = [_text_content(text) for text in texts[start:end]]
+            return await embed_batch(http, contents, task)
+
+    async with httpx.AsyncClient(timeout=JINA_TIMEOUT) as http:
+        results = await asyncio.gather(*(run_batch(http, start, end) for start, end in batches))
+
+    chunks_data = []
+    failed = 0
+    for (start, end), vectors in zip(batches, results):
+        if vectors is None:
+            failed += end - start
+            print(f"Skipping documents {start}-{end - 1}: their batch failed")
+            continue
+        for doc_idx, embedding in zip(range(start, end), vectors):
+            original_text = texts[doc_idx]
+            metadata = original_text if isinstance(original_text, dict) else {}
+
+            if not isinstance(embedding, list) or len(embedding) != VECTOR_SIZE:
+                print(f"Warning: Invalid embedding for document {doc_idx}")
+                failed += 1
+                continue
+
+            chunks_data.append({
+                "embedding": embedding,
+                "doc_idx": doc_idx,
+                "chunk_idx": metadata.get("chunk_idx", 0),
+                "title": metadata.get("title", ""),
+                "date": metadata.get("date", ""),
+                "content": _text_content(original_text),
+                "url": metadata.get("url", "")
+            })
+
+    print(f"Generated {len(chunks_data)} valid embeddings ({failed} failed)")
+    return chunks_data
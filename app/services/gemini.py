@@ -1,6 +1,9 @@
 from google import generativeai
 import os
+import time
 from dotenv import load_dotenv
+from .context_packer import pack_context, CONTEXT_TOKEN_BUDGET
+from .metrics import span, STAGE_SECONDS, UPSTREAM_ERRORS, PROMPT_TOKENS
 
 load_dotenv()
 
@@ -9,6 +12,12 @@ GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
 # Global variable to store the initialized Gemini model
 _gemini_model = None
 
+# Fallback answers returned instead of raising; these must never be cached
+UNAVAILABLE_ANSWER = "I apologize, but I'm currently unable to process your request due to a technical issue."
+EMPTY_ANSWER = "I apologize, but I couldn't generate a response based on the provided context."
+ERROR_ANSWER = "I apologize, but I encountered an error while processing your request."
+FALLBACK_ANSWERS = {UNAVAILABLE_ANSWER, EMPTY_ANSWER, ERROR_ANSWER}
+
 
 def format_news_context(news_context: list) -> str:
     """Format news context for the prompt"""
@@ -41,22 +50,26 @@ def initialize_gemini():
 
 
 
-def generate_final_answer(query: str, news_context: list):
-    """Generate an answer using the Gemini model."""
-    try:
-        # Initialize model if needed
-        model = initialize_gemini()
-        if not model:
-            return "I apologize, but I'm currently unable to process your request due to a technical issue."
-        
-        # Format news context into a string
-        context_str = "\n\n".join(
-            f"Article {i+1}:\nTitle: {article.get('title', 'No title')}\n{article.get('content', 'No content')}"
-            for i, article in enumerate(news_context)
-        )
-        
-        # Construct the prompt
-        prompt = f"""Based on the following news articles, provide a concise summary to this question: {query}
+def build_prompt(query: str, news_context: list, conversation: str = None) -> str:
+    """Build the Gemini prompt from the query, retrieved articles and optional conversation memory."""
+    # Fit the articles into the context token budget
+    with span("pack_context"):
+        packed, packed_tokens = pack_context(query, news_context)
+    PROMPT_TOKENS.inc(packed_tokens, kind="context")
+    print(f"Packed {len(packed)} of {len(news_context)} articles into "
+          f"{packed_tokens} context tokens (budget {CONTEXT_TOKEN_BUDGET})")
+
+    # Format news context into a string
+    context_str = "\n\n".join(
+        f"Article {i+1}:\nTitle: {article.get('title', 'No title')}\n{article.get('content', 'No content')}"
+        for i, article in enumerate(packed)
+    )
+
+    # Earlier turns, already bounded by the conversation token budget
+    conversation_str = f"Conversation so far:\n{conversation}\n\n" if conversation else ""
+
+    # Construct the prompt
+    prompt = f"""{conversation_str}Based on the following news articles, provide a concise summary to this question: {query}
 
 Context from news articles:
 {context_str}
@@ -67,36 +80,95 @@ Please format your response in a clear, concise paragraph that:
 3. Is easy to read and understand
 4. Only includes information relevant to the question
 5. If there's no relevant information, clearly state that"""
-        
-        # Generate response
+    prompt_tokens = count_tokens(prompt)
+    PROMPT_TOKENS.inc(prompt_tokens, kind="answer")
+    print(f"Prompt size: ~{prompt_tokens} tokens")
+    return prompt
+
+
+def _extract_answer(response):
+    """Extract and process the text of a Gemini response."""
+    if not response or not response.text:
+        print("No response generated from Gemini")
+        return EMPTY_ANSWER
+
+    answer = response.text.strip()
+    print(f"Generated answer: {answer[:200]}...")
+    return answer
+
+
+async def generate_final_answer_async(query: str, news_context: list, conversation: str = None):
+    """Generate an answer using the Gemini model without blocking the event loop."""
+    try:
+        model = initialize_gemini()
+        if not model:
+            return UNAVAILABLE_ANSWER
+
         print("Generating response from Gemini...")
-        response = model.generate_content(prompt)
-        
-        # Extract and process the response
-        if not response or not response.text:
-            print("No response generated from Gemini")
-            return "I apologize, but I couldn't generate a response based on the provided context."
-        
-        answer = response.text.strip()
-        print(f"Generated answer: {answer[:200]}...")
-        
-        return answer
-        
+        prompt = build_prompt(query, news_context, conversation)
+        with span("gemini_generate"):
+            response = await model.generate_content_async(prompt)
+        return _extract_answer(response)
+
     except Exception as e:
         print(f"Error generating answer: {str(e)}")
-        return "I apologize, but I encountered an error while processing your request."
-
-        if "API_KEY_INVALID" in str(e):
-            return "Error: Invalid API key. Please check your API key configuration."
-        elif "PERMISSION_DENIED" in str(e):
-            return "Error: Permission denied. Please check API key permissions."
-        elif "QUOTA_EXCEEDED" in str(e):
-            return "Error: API quota exceeded. Please try again later."
-        elif "model not found" in str(e).lower():
-            return "Error: Model not found. Please check model configuration."
-        else:
-            return "I apologize, but I encountered an error while trying to generate an answer. Please try again."
+        UPSTREAM_ERRORS.inc(service="gemini")
+        return ERROR_ANSWER
+
+
+async def stream_final_answer_async(query: str, news_context: list, conversation: str = None):
+    """Yield answer text chunks from Gemini as they are generated."""
+    produced = False
+    try:
+        model = initialize_gemini()
+        if not model:
+            yield UNAVAILABLE_ANSWER
+            return
+
+        print("Streaming response from Gemini...")
+        prompt = build_prompt(query, news_context, conversation)
+        started = time.perf_counter()
+        response = await model.generate_content_async(prompt, stream=True)
+        async for chunk in response:
+            try:
+                text = chunk.text
+            except ValueError:
+                # Chunks without text parts (e.g. safety metadata) have no .text
+                continue
+            if text:
+                if not produced:
+                    STAGE_SECONDS.observe(time.perf_counter() - started, stage="gemini_first_token")
+                produced = True
+                yield text
+        STAGE_SECONDS.observe(time.perf_counter() - started, stage="gemini_stream")
 
+    except Exception as e:
+        print(f"Error streaming answer: {str(e)}")
+        UPSTREAM_ERRORS.inc(service="gemini")
+        if not produced:
+            yield ERROR_ANSWER
+        return
+
+    if not produced:
+        print("No response generated from Gemini")
+        yield EMPTY_ANSWER
+
+
+async def complete_text_async(prompt: str):
+    """Run a short auxiliary prompt (summaries, query rewrites); returns None on failure."""
+    try:
+        model = initialize_gemini()
+        if not model:
+            return None
+        PROMPT_TOKENS.inc(count_tokens(prompt), kind="auxiliary")
+        with span("gemini_auxiliary"):
+            response = await model.generate_content_async(prompt)
+        text = response.text.strip() if response and response.text else ""
+        return text or None
+    except Exception as e:
+        print(f"Error running auxiliary prompt: {str(e)}")
+        UPSTREAM_ERRORS.inc(service="gemini")
+        return None
 
 
 # Test the Gemini service if run directly
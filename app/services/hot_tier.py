@@ -0,0 +1,272 @@
+"""
+In-process hot tier: recent article vectors searched locally with NumPy.
+
+Vectors live in a float32 file under HOT_TIER_DIR that every worker
+memory-maps read-only, so the OS page cache holds one copy however many
+workers there are. Ingestion writes each refresh as a new versioned file set
+and then atomically replaces manifest.json; workers notice the new manifest
+and remap. There must be a single writer (the ingestion job).
+
+    python -m app.services.hot_tier    # rebuild from Qdrant
+"""
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Iterable, List, NamedTuple, Optional
+import numpy as np
+from dotenv import load_dotenv
+
+from ..db.vector_db import (
+    client, dense_vector, point_id, point_payload, published_timestamp, time_filter, QDRANT_COLLECTION_NAME,
+    VECTOR_SIZE
+)
+
+load_dotenv()
+
+HOT_TIER_ENABLED = os.getenv('HOT_TIER_ENABLED', 'false').lower() == 'true'
+HOT_TIER_DIR = os.getenv('HOT_TIER_DIR', '.hot_tier')
+# Articles published within this many hours are kept in the hot tier
+HOT_TIER_HOURS = float(os.getenv('HOT_TIER_HOURS', '48'))
+HOT_TIER_MAX_POINTS = int(os.getenv('HOT_TIER_MAX_POINTS', '50000'))
+# Qdrant is skipped when the hot tier fills the request with hits at least this similar
+HOT_TIER_MIN_SCORE = float(os.getenv('HOT_TIER_MIN_SCORE', '0.5'))
+# How often workers check for a new manifest, in seconds
+HOT_TIER_CHECK_INTERVAL = float(os.getenv('HOT_TIER_CHECK_INTERVAL', '2'))
+
+MANIFEST_FILE = "manifest.json"
+
+
+def _timestamp(value) -> float:
+    """Unix time of a payload date; 0 (always outside the window) if unparseable"""
+    return float(published_timestamp(value) or 0)
+
+
+def _jsonable(payload: Dict) -> Dict:
+    date = payload.get("date")
+    if isinstance(date, datetime):
+        payload = {**payload, "date": date.isoformat()}
+    return payload
+
+
+def _normalize_rows(vectors) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, VECTOR_SIZE)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+class _Snapshot(NamedTuple):
+    """One loaded version; never mutated, so readers need no lock"""
+    version: Optional[int]
+    vectors: Optional[np.ndarray]
+    ids: List[str]
+    payloads: List[Dict]
+    timestamps: np.ndarray
+
+
+class _HotIndex:
+    """Read-only view of the current on-disk version"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.checked_at = 0.0
+        # Replaced by a single assignment, so a reader sees one whole version
+        self.snapshot = _Snapshot(None, None, [], [], np.zeros(0))
+
+    def _read_manifest(self) -> Optional[Dict]:
+        try:
+            with open(os.path.join(HOT_TIER_DIR, MANIFEST_FILE)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def refresh(self, force: bool = False) -> None:
+        now = time.monotonic()
+        if not force and now - self.checked_at < HOT_TIER_CHECK_INTERVAL:
+            return
+        with self.lock:
+            self.checked_at = now
+            manifest = self._read_manifest()
+            if not manifest or manifest["version"] == self.snapshot.version:
+                return
+            try:
+                with open(os.path.join(HOT_TIER_DIR, manifest["meta"])) as f:
+                    meta = json.load(f)
+                count = manifest["count"]
+                vectors = None
+                if count:
+                    vectors = np.memmap(os.path.join(HOT_TIER_DIR, manifest["vectors"]),
+                                        dtype=np.float32, mode='r', shape=(count, manifest["dim"]))
+            except (OSError, ValueError, KeyError) as e:
+                # The writer may have cleaned up a version we were about to map
+                print(f"Error loading hot tier version {manifest.get('version')}: {str(e)}")
+                return
+            self.snapshot = _Snapshot(
+                manifest["version"], vectors, meta["ids"], meta["payloads"],
+                np.asarray(meta["timestamps"], dtype=np.float64)
+            )
+            print(f"Hot tier loaded: version {manifest['version']}, {count} points")
+
+
+_index = _HotIndex()
+
+
+def search_hot_tier(query_vector, top_k: int, with_vectors: bool = False,
+                    since: float = None, until: float = None) -> Optional[List[Dict]]:
+    """
+    Cosine top_k over the hot tier, restricted to the HOT_TIER_HOURS window
+    and the optional since/until publish-time window (unix seconds).
+    Returns points shaped like Qdrant hits, or None if there is no hot tier.
+    """
+    _index.refresh()
+    _, vectors, ids, payloads, timestamps = _index.snapshot
+    if vectors is None or len(query_vector) != vectors.shape[1]:
+        return None
+
+    query = _normalize_rows(query_vector)[0]
+    scores = np.asarray(vectors @ query)
+    cutoff = time.time() - HOT_TIER_HOURS * 3600
+    scores[timestamps < max(cutoff, since or cutoff)] = -np.inf
+    if until is not None:
+        scores[timestamps > until] = -np.inf
+    top_k = min(top_k, len(scores))
+    top = np.argpartition(-scores, top_k - 1)[:top_k]
+    top = top[np.argsort(-scores[top])]
+
+    points = []
+    for i in top:
+        if scores[i] == -np.inf:
+            break
+        point = {"id": ids[i], "score": float(scores[i]), "payload": payloads[i]}
+        if with_vectors:
+            point["vector"] = vectors[i]
+        points.append(point)
+    return points
+
+
+def merge_points(hot: Optional[List[Dict]], remote: Optional[List[Dict]], limit: int) -> Optional[List[Dict]]:
+    """Union of hot-tier and Qdrant hits by point id, best score first"""
+    if hot is None and remote is None:
+        return None
+    merged: Dict[str, Dict] = {}
+    for point in (hot or []) + (remote or []):
+        current = merged.get(point["id"])
+        if current is None or point["score"] > current["score"]:
+            merged[point["id"]] = point
+    return sorted(merged.values(), key=lambda p: p["score"], reverse=True)[:limit]
+
+
+def _write_version(rows: Iterable, count: int, ids: List[str], payloads: List[Dict], timestamps: List[float]) -> None:
+    """Write one version file set and publish it by replacing the manifest"""
+    os.makedirs(HOT_TIER_DIR, exist_ok=True)
+    previous = _index._read_manifest()
+    version = (previous["version"] + 1) if previous else 1
+    vectors_file, meta_file = f"vectors-{version}.f32", f"meta-{version}.json"
+
+    if count:
+        out = np.memmap(os.path.join(HOT_TIER_DIR, vectors_file), dtype=np.float32, mode='w+',
+                        shape=(count, VECTOR_SIZE))
+        offset = 0
+        for block in rows:
+            out[offset:offset + len(block)] = block
+            offset += len(block)
+        out.flush()
+        del out
+    with open(os.path.join(HOT_TIER_DIR, meta_file), 'w') as f:
+        json.dump({"ids": ids, "payloads": payloads, "timestamps": timestamps}, f)
+
+    manifest_tmp = os.path.join(HOT_TIER_DIR, f"{MANIFEST_FILE}.tmp")
+    with open(manifest_tmp, 'w') as f:
+        json.dump({"version": version, "count": count, "dim": VECTOR_SIZE,
+                   "vectors": vectors_file, "meta": meta_file}, f)
+    os.replace(manifest_tmp, os.path.join(HOT_TIER_DIR, MANIFEST_FILE))
+
+    # Keep the previous version for workers that are mid-reload
+    keep = {vectors_file, meta_file, MANIFEST_FILE}
+    if previous:
+        keep.update((previous["vectors"], previous["meta"]))
+    for name in os.listdir(HOT_TIER_DIR):
+        if name not in keep and (name.startswith("vectors-") or name.startswith("meta-")):
+            os.remove(os.path.join(HOT_TIER_DIR, name))
+    print(f"Hot tier version {version} written: {count} points")
+
+
+def update_hot_tier(documents: List[Dict]) -> None:
+    """
+    Incrementally refresh the hot tier with newly stored chunks (dicts with an
+    "embedding", as upserted by ingestion). Rows for the same articles are
+    replaced, rows outside the time window are dropped, and the newest
+    HOT_TIER_MAX_POINTS are kept. Bootstraps from Qdrant if no version exists.
+    """
+    _index.refresh(force=True)
+    current = _index.snapshot
+    if current.version is None:
+        rebuild_hot_tier()
+        return
+
+    cutoff = time.time() - HOT_TIER_HOURS * 3600
+    new_docs = [doc for doc in documents if _timestamp(doc.get("date")) >= cutoff]
+    new_doc_ids = {doc.get("doc_id") for doc in new_docs}
+    old_keep = [
+        i for i, (payload, ts) in enumerate(zip(current.payloads, current.timestamps))
+        if ts >= cutoff and payload.get("doc_id") not in new_doc_ids
+    ]
+
+    # Newest first when trimming to HOT_TIER_MAX_POINTS
+    candidates = [("new", i, _timestamp(doc.get("date"))) for i, doc in enumerate(new_docs)]
+    candidates += [("old", i, float(current.timestamps[i])) for i in old_keep]
+    candidates.sort(key=lambda c: c[2], reverse=True)
+    candidates = candidates[:HOT_TIER_MAX_POINTS]
+    old_rows = sorted(i for source, i, _ in candidates if source == "old")
+    new_rows = sorted(i for source, i, _ in candidates if source == "new")
+
+    ids = [current.ids[i] for i in old_rows] + [point_id(new_docs[i]) for i in new_rows]
+    payloads = ([current.payloads[i] for i in old_rows]
+                + [_jsonable(point_payload(new_docs[i])) for i in new_rows])
+    timestamps = ([float(current.timestamps[i]) for i in old_rows]
+                  + [_timestamp(new_docs[i].get("date")) for i in new_rows])
+
+    def rows():
+        for start in range(0, len(old_rows), 4096):
+            yield current.vectors[old_rows[start:start + 4096]]
+        if new_rows:
+            yield _normalize_rows([new_docs[i]["embedding"] for i in new_rows])
+
+    _write_version(rows(), len(ids), ids, payloads, timestamps)
+    _index.refresh(force=True)
+
+
+def rebuild_hot_tier() -> None:
+    """
+    Rebuild the hot tier from scratch by scrolling the collection's recent
+    points, selected in Qdrant through the published_at index
+    """
+    cutoff = time.time() - HOT_TIER_HOURS * 3600
+    recent = []
+    offset = None
+    while True:
+        points, offset = client.scroll(
+            collection_name=QDRANT_COLLECTION_NAME, scroll_filter=time_filter(since=cutoff),
+            limit=1024, offset=offset, with_payload=True, with_vectors=True
+        )
+        for point in points:
+            ts = _timestamp(point.payload.get("date"))
+            vector = dense_vector(point.vector)
+            if ts >= cutoff and vector is not None:
+                recent.append((ts, str(point.id), _jsonable(dict(point.payload)), vector))
+        if offset is None:
+            break
+    recent.sort(key=lambda r: r[0], reverse=True)
+    recent = recent[:HOT_TIER_MAX_POINTS]
+
+    def rows():
+        for start in range(0, len(recent), 4096):
+            yield _normalize_rows([r[3] for r in recent[start:start + 4096]])
+
+    _write_version(rows(), len(recent), [r[1] for r in recent], [r[2] for r in recent], [r[0] for r in recent])
+    _index.refresh(force=True)
+
+
+if __name__ == "__main__":
+    rebuild_hot_tier()
@@ -1,8 +1,14 @@
+import asyncio
 import os
-import requests
-from datetime import datetime
-from .embeddings import generate_embeddings
-from ..db.vector_db import insert_documents
+import time
+import httpx
+from datetime import datetime, timedelta
+from .embeddings import embed_batch, JINA_TIMEOUT, EMBED_CONCURRENCY, EMBED_BATCH_MAX_CHARS, EMBED_BATCH_MAX_ITEMS, VECTOR_SIZE
+from .chunking import chunk_articles, document_id, content_hash
+from .answer_cache import invalidate_answer_cache
+from .hot_tier import HOT_TIER_ENABLED, HOT_TIER_HOURS, update_hot_tier
+from ..db.vector_db import bulk_insert_documents, delete_stale_points, point_id
+from ..db.redis_cache import get_hash_cache, set_hash_cache
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -11,67 +17,274 @@ load_dotenv()
 NEWS_API_KEY = os.getenv("NEWSAPI_KEY")
 NEWS_API_URL = "https://newsapi.org/v2/everything"
 
-def fetch_news_articles(limit=50):
+# Redis hash of doc_id -> content hash for articles already embedded and stored.
+# Losing it only costs a re-embed: point IDs are content-addressed, so upserts are idempotent.
+MANIFEST_KEY = "ingest:manifest"
+
+# Pipeline settings
+INGEST_MAX_PAGES = int(os.getenv('INGEST_MAX_PAGES', '5'))
+INGEST_PAGE_SIZE = int(os.getenv('INGEST_PAGE_SIZE', '50'))
+INGEST_QUEUE_SIZE = int(os.getenv('INGEST_QUEUE_SIZE', '256'))
+INGEST_EMBED_WORKERS = int(os.getenv('INGEST_EMBED_WORKERS', str(EMBED_CONCURRENCY)))
+INGEST_UPSERT_BATCH = int(os.getenv('INGEST_UPSERT_BATCH', '128'))
+# Recent chunks buffered before each hot tier refresh (bounds the memory they hold)
+INGEST_HOT_TIER_BATCH = int(os.getenv('INGEST_HOT_TIER_BATCH', '1024'))
+
+_DONE = object()
+
+
+def _news_params(page_size, page=1):
+    return {
+        "apiKey": NEWS_API_KEY,
+        "language": "en",
+        "q": "technology",  # Search term
+        "sortBy": "publishedAt",
+        "pageSize": page_size,
+        "page": page
+    }
+
+
+def _parse_articles(data):
     articles = []
-    try:
-        params = {
-            "apiKey": NEWS_API_KEY,
-            "language": "en",
-            "q": "technology",  # Search term
-            "sortBy": "publishedAt",
-            "pageSize": limit
-        }
-        print("Using params:", params)
-        
-        print("Fetching articles from NewsAPI...")
-        response = requests.get(NEWS_API_URL, params=params)
-        print(f"Response status: {response.status_code}")
-        
-        if response.status_code == 200:
-            data = response.json()
-            print("Full API response:", data)
-            print(f"Total articles from API: {len(data.get('articles', []))}")
-            for article in data.get("articles", []):
-                if article.get("content") and article.get("title"):
-                    articles.append({
-                        "title": article["title"],
-                        "date": datetime.strptime(article["publishedAt"], "%Y-%m-%dT%H:%M:%SZ"),
-                        "content": article["content"]
-                    })
-            print(f"Articles with content: {len(articles)}")
-        else:
-            print(f"Error: {response.status_code} - {response.text}")
-    except Exception as e:
-        print(f"Error fetching articles: {str(e)}")
-    
+    for article in data.get("articles", []):
+        if article.get("content") and article.get("title"):
+            articles.append({
+                "title": article["title"],
+                "date": datetime.strptime(article["publishedAt"], "%Y-%m-%dT%H:%M:%SZ"),
+                "content": article["content"],
+                "url": article.get("url", "")
+            })
     return articles
 
+
+async def fetch_news_pages(max_pages=None, page_size=None):
+    """Yield one list of parsed articles per NewsAPI results page"""
+    max_pages = max_pages or INGEST_MAX_PAGES
+    page_size = page_size or INGEST_PAGE_SIZE
+    async with httpx.AsyncClient(timeout=30) as http:
+        for page in range(1, max_pages + 1):
+            try:
+                response = await http.get(NEWS_API_URL, params=_news_params(page_size, page))
+            except httpx.HTTPError as e:
+                print(f"Error fetching page {page}: {str(e)}")
+                return
+            if response.status_code != 200:
+                # NewsAPI answers past-the-end pages on limited plans with an error
+                print(f"Stopping at page {page}: {response.status_code} - {response.text[:200]}")
+                return
+            try:
+                data = response.json()
+                articles = _parse_articles(data)
+            except ValueError as e:
+                # Malformed body or publishedAt: skip the page, keep ingesting
+                print(f"Skipping page {page}: invalid response ({str(e)})")
+                continue
+            yield articles
+            if page * page_size >= data.get("totalResults", 0):
+                return
+
+
+def filter_changed_articles(articles):
+    """
+    Drop articles whose content is already stored, per the manifest. Every
+    returned article has its doc_id and content hash attached.
+    """
+    for article in articles:
+        article["doc_id"] = document_id(article)
+        article["content_hash"] = content_hash(article)
+
+    stored = get_hash_cache(MANIFEST_KEY, [article["doc_id"] for article in articles])
+    return [
+        article for article, stored_hash in zip(articles, stored)
+        if stored_hash != article["content_hash"]
+    ]
+
+
+class _StageStats:
+    """Item counts, busy time and queue depth samples for one pipeline stage"""
+
+    def __init__(self, name, queue=None):
+        self.name = name
+        self.queue = queue
+        self.items = 0
+        self.busy = 0.0
+        self.depth_samples = []
+
+    def sample(self):
+        if self.queue is not None:
+            self.depth_samples.append(self.queue.qsize())
+
+    def report(self, elapsed):
+        line = (f"{self.name:<8} {self.items:>7} items  "
+                f"{self.items / elapsed if elapsed else 0:>8.1f}/s wall  "
+                f"busy {self.busy:>6.2f}s")
+        if self.depth_samples:
+            avg = sum(self.depth_samples) / len(self.depth_samples)
+            line += f"  out-queue avg {avg:.1f} max {max(self.depth_samples)}"
+        return line
+
+    def as_dict(self, elapsed):
+        return {
+            "items": self.items,
+            "per_second": self.items / elapsed if elapsed else 0.0,
+            "busy_seconds": self.busy,
+            "queue_max": max(self.depth_samples) if self.depth_samples else 0,
+            "queue_avg": sum(self.depth_samples) / len(self.depth_samples) if self.depth_samples else 0.0
+        }
+
+
+async def run_ingestion_pipeline(max_pages=None, page_size=None):
+    """
+    Streaming ingestion: fetch pages -> chunk -> embed -> batched upsert.
+
+    Stages are connected by bounded queues (INGEST_QUEUE_SIZE), so a slow
+    stage blocks the ones before it and memory stays flat regardless of how
+    many articles are ingested. Returns per-stage statistics.
+    """
+    chunk_queue = asyncio.Queue(maxsize=INGEST_QUEUE_SIZE)
+    upsert_queue = asyncio.Queue(maxsize=INGEST_QUEUE_SIZE)
+    fetch_stats = _StageStats("fetch")
+    chunk_stats = _StageStats("chunk", chunk_queue)
+    embed_stats = _StageStats("embed", upsert_queue)
+    upsert_stats = _StageStats("upsert")
+
+    # Per-article bookkeeping so the manifest only records fully stored articles
+    expected_chunks = {}
+    stored_chunks = {}
+    stored_points = {}
+    content_hashes = {}
+    failed_docs = set()
+    # Recently published chunks, with embeddings, waiting for the next hot tier refresh
+    hot_chunks = []
+    hot_cutoff = datetime.utcnow() - timedelta(hours=HOT_TIER_HOURS)
+
+    async def produce():
+        async for page in fetch_news_pages(max_pages, page_size):
+            fetch_stats.items += len(page)
+            started = time.perf_counter()
+            changed = await asyncio.to_thread(filter_changed_articles, page)
+            for chunk in chunk_articles(changed):
+                expected_chunks[chunk["doc_id"]] = expected_chunks.get(chunk["doc_id"], 0) + 1
+                chunk_stats.items += 1
+                chunk_stats.sample()
+                await chunk_queue.put(chunk)
+            for article in changed:
+                content_hashes[article["doc_id"]] = article["content_hash"]
+            chunk_stats.busy += time.perf_counter() - started
+        for _ in range(INGEST_EMBED_WORKERS):
+            await chunk_queue.put(_DONE)
+
+    async def embed_worker(http):
+        done = False
+        while not done:
+            # Collect a batch bounded by item count and total characters
+            batch = []
+            chars = 0
+            item = await chunk_queue.get()
+            while item is not _DONE:
+                batch.append(item)
+                chars += len(item["content"])
+                if len(batch) >= EMBED_BATCH_MAX_ITEMS or chars >= EMBED_BATCH_MAX_CHARS or chunk_queue.empty():
+                    break
+                item = await chunk_queue.get()
+            done = item is _DONE
+            if not batch:
+                continue
+
+            started = time.perf_counter()
+            vectors = await embed_batch(http, [chunk["content"] for chunk in batch], "retrieval.document")
+            embed_stats.busy += time.perf_counter() - started
+            if vectors is None:
+                failed_docs.update(chunk["doc_id"] for chunk in batch)
+                continue
+            for chunk, vector in zip(batch, vectors):
+                if not isinstance(vector, list) or len(vector) != VECTOR_SIZE:
+                    failed_docs.add(chunk["doc_id"])
+                    continue
+                embed_stats.items += 1
+                embed_stats.sample()
+                await upsert_queue.put({**chunk, "embedding": vector})
+
+    async def flush(batch):
+        started = time.perf_counter()
+        inserted = await asyncio.to_thread(bulk_insert_documents, batch)
+        upsert_stats.busy += time.perf_counter() - started
+        upsert_stats.items += inserted
+        if inserted != len(batch):
+            failed_docs.update(chunk["doc_id"] for chunk in batch)
+            return
+        for chunk in batch:
+            stored_chunks[chunk["doc_id"]] = stored_chunks.get(chunk["doc_id"], 0) + 1
+            stored_points.setdefault(chunk["doc_id"], []).append(point_id(chunk))
+        if HOT_TIER_ENABLED:
+            hot_chunks.extend(chunk for chunk in batch if chunk["date"] >= hot_cutoff)
+            if len(hot_chunks) >= INGEST_HOT_TIER_BATCH:
+                await flush_hot_tier()
+
+    async def flush_hot_tier():
+        # Runs only from the upsert worker (then once at the end), so the hot
+        # tier keeps its single writer
+        if hot_chunks:
+            try:
+                await asyncio.to_thread(update_hot_tier, list(hot_chunks))
+            except Exception as e:
+                # The hot tier only speeds up search: don't stop the upserts
+                print(f"Error updating hot tier: {str(e)}")
+            hot_chunks.clear()
+
+    async def upsert_worker():
+        batch = []
+        while True:
+            item = await upsert_queue.get()
+            if item is _DONE:
+                break
+            batch.append(item)
+            if len(batch) >= INGEST_UPSERT_BATCH:
+                await flush(batch)
+                batch = []
+        if batch:
+            await flush(batch)
+
+    started = time.perf_counter()
+    async with httpx.AsyncClient(timeout=JINA_TIMEOUT) as http:
+        upserter = asyncio.create_task(upsert_worker())
+        await asyncio.gather(produce(), *(embed_worker(http) for _ in range(INGEST_EMBED_WORKERS)))
+        await upsert_queue.put(_DONE)
+        await upserter
+    elapsed = time.perf_counter() - started
+
+    complete = {
+        doc_id: content_hashes[doc_id]
+        for doc_id, count in expected_chunks.items()
+        if doc_id not in failed_docs and stored_chunks.get(doc_id) == count
+    }
+    # Chunks of an article's previous version (or legacy points with other
+    # IDs) go only once the new version is fully stored; an article that
+    # failed keeps serving what it had
+    if complete:
+        await asyncio.to_thread(
+            delete_stale_points, {doc_id: stored_points[doc_id] for doc_id in complete}
+        )
+    await asyncio.to_thread(set_hash_cache, MANIFEST_KEY, complete)
+    if upsert_stats.items:
+        invalidate_answer_cache()
+        if HOT_TIER_ENABLED:
+            await flush_hot_tier()
+
+    print(f"\nIngestion finished in {elapsed:.1f}s: {len(complete)} articles stored, "
+          f"{len(failed_docs)} failed")
+    for stats in (fetch_stats, chunk_stats, embed_stats, upsert_stats):
+        print(stats.report(elapsed))
+
+    return {
+        "elapsed_seconds": elapsed,
+        "articles_stored": len(complete),
+        "articles_failed": len(failed_docs),
+        "stages": {s.name: s.as_dict(elapsed) for s in (fetch_stats, chunk_stats, embed_stats, upsert_stats)}
+    }
+
+
 def scrape_and_store_articles():
-    # Fetch articles from BBC News feeds
-    articles = fetch_news_articles()
-    if not articles:
-        print("No articles found")
-        return 0
-    
-    # Extract contents for embedding generation
-    contents = [article["content"] for article in articles]
-    
-    if articles:
-        # Generate embeddings for all article contents
-        chunks_data = generate_embeddings(contents)
-        
-        # Create chunked articles for vector storage
-        chunked_articles = [{
-            "title": articles[chunk["doc_idx"]]["title"],
-            "date": articles[chunk["doc_idx"]]["date"],
-            "content": chunk["content"],
-            "embedding": chunk["embedding"],
-            "doc_idx": chunk["doc_idx"],
-            "chunk_idx": chunk["chunk_idx"]
-        } for chunk in chunks_data]
-        
-        # Store chunked articles in vector database
-        insert_documents(chunked_articles)
-        
-        return len(chunked_articles)
-    return 0
+    """Run the ingestion pipeline and return the number of chunks stored"""
+    stats = asyncio.run(run_ingestion_pipeline())
+    return stats["stages"]["upsert"]["items"]
@@ -1,55 +1,272 @@
-from typing import List, Dict, Any
-from ..db.vector_db import search_documents, get_collection_info
-from .embeddings import generate_query_embedding
+import asyncio
+import os
+import time
+from typing import List, Dict, Any, Optional
+import numpy as np
+from dotenv import load_dotenv
+from ..db.vector_db import (
+    search_documents_async, search_sparse_async, retrieve_vectors_async, time_filter, published_timestamp,
+    PUBLISHED_AT_FIELD
+)
+from .embeddings import generate_query_embedding_async
+from .hot_tier import HOT_TIER_ENABLED, HOT_TIER_MIN_SCORE, search_hot_tier, merge_points
+from .metrics import span
 
-async def search_articles(query: str, top_k: int = 3) -> List[Dict[str, Any]]:
-    """Search for articles related to a query."""
+load_dotenv()
+
+# Retrieval mode: "dense", "sparse" or "hybrid" (both, merged with reciprocal rank fusion)
+SEARCH_MODE = os.getenv('SEARCH_MODE', 'hybrid')
+RRF_K = int(os.getenv('RRF_K', '60'))
+RRF_DENSE_WEIGHT = float(os.getenv('RRF_DENSE_WEIGHT', '1.0'))
+RRF_SPARSE_WEIGHT = float(os.getenv('RRF_SPARSE_WEIGHT', '1.0'))
+# Each retriever returns top_k * this many candidates for fusion
+HYBRID_OVERFETCH = int(os.getenv('HYBRID_OVERFETCH', '3'))
+
+# Document-level diversification: fetch top_k * MMR_OVERFETCH chunks, group them
+# by article and pick articles with Maximal Marginal Relevance
+MMR_OVERFETCH = int(os.getenv('MMR_OVERFETCH', '4'))
+MMR_LAMBDA = float(os.getenv('MMR_LAMBDA', '0.7'))
+MAX_CHUNKS_PER_DOC = int(os.getenv('MAX_CHUNKS_PER_DOC', '3'))
+SNIPPET_MAX_CHARS = int(os.getenv('SNIPPET_MAX_CHARS', '2000'))
+
+# Time-decay re-scoring: final score = (1 - RECENCY_WEIGHT) * relevance
+# + RECENCY_WEIGHT * 0.5 ** (age / RECENCY_HALF_LIFE_HOURS); 0 disables it
+RECENCY_WEIGHT = float(os.getenv('RECENCY_WEIGHT', '0.2'))
+RECENCY_HALF_LIFE_HOURS = float(os.getenv('RECENCY_HALF_LIFE_HOURS', '72'))
+
+
+def reciprocal_rank_fusion(ranked_lists: List[List[Dict]], weights: List[float], k: int = None) -> List[Dict]:
+    """
+    Merge ranked point lists: each point scores sum(weight / (k + rank)) over
+    the lists it appears in, divided by the best possible total sum(weights) /
+    (k + 1) so that 1.0 means ranked first everywhere. Returns points sorted by
+    fused score, with the fused value in "score" and the original one in
+    "raw_score".
+    """
+    k = RRF_K if k is None else k
+    best = sum(weights[:len(ranked_lists)]) / (k + 1) or 1.0
+    fused: Dict[str, Dict] = {}
+    for points, weight in zip(ranked_lists, weights):
+        for rank, point in enumerate(points, 1):
+            entry = fused.get(point["id"])
+            if entry is None:
+                entry = fused[point["id"]] = {**point, "raw_score": point.get("score", 0.0), "score": 0.0}
+            entry["score"] += weight / (k + rank) / best
+    return sorted(fused.values(), key=lambda p: p["score"], reverse=True)
+
+
+def apply_time_decay(points: List[Dict], now: float = None, weight: float = None,
+                     half_life_hours: float = None) -> List[Dict]:
+    """
+    Blend relevance with freshness and re-sort. Relevance is the retrieval
+    score itself (cosine or normalized fusion score, clipped to [0, 1]; BM25
+    scores are divided by the best one when it exceeds 1), so a weak result
+    set stays weak instead of being stretched to fill the range. Points
+    without a publish time get no freshness credit. The pre-decay score is
+    kept in "raw_score".
+    """
+    weight = RECENCY_WEIGHT if weight is None else weight
+    half_life_hours = RECENCY_HALF_LIFE_HOURS if half_life_hours is None else half_life_hours
+    if not points or weight <= 0 or half_life_hours <= 0:
+        return points
+    now = now or time.time()
+
+    scores = np.asarray([p.get("score", 0.0) for p in points], dtype=np.float64)
+    relevance = np.clip(scores / max(1.0, scores.max()), 0.0, 1.0)
+
+    decayed = []
+    for point, rel in zip(points, relevance):
+        payload = point.get('payload') or {}
+        published = payload.get(PUBLISHED_AT_FIELD) or published_timestamp(payload.get('date'))
+        freshness = 0.5 ** (max(now - published, 0) / 3600 / half_life_hours) if published else 0.0
+        decayed.append({
+            **point,
+            "raw_score": point.get("raw_score", point.get("score", 0.0)),
+            "score": (1 - weight) * float(rel) + weight * freshness
+        })
+    return sorted(decayed, key=lambda p: p["score"], reverse=True)
+
+
+def group_by_document(points: List[Dict]) -> List[Dict]:
+    """
+    Collapse chunk hits into one entry per article, ordered by best chunk score.
+    Each entry keeps its best point (id, score, vector) and its top chunks.
+    """
+    groups: Dict[str, Dict] = {}
+    for point in points:
+        payload = point.get('payload') or {}
+        key = payload.get('doc_id') or payload.get('title') or point['id']
+        group = groups.get(key)
+        if group is None:
+            groups[key] = {"best": point, "chunks": [point]}
+        else:
+            group["chunks"].append(point)
+    return sorted(groups.values(), key=lambda g: g["best"].get("score", 0.0), reverse=True)
+
+
+def mmr_select(groups: List[Dict], top_k: int, lambda_: float = None) -> List[Dict]:
+    """
+    Pick top_k documents by Maximal Marginal Relevance over their best-chunk
+    vectors: lambda * relevance - (1 - lambda) * max similarity to picks so far.
+    Relevance is the retrieval score rescaled to [0, 1]. Falls back to score
+    order when vectors are missing.
+    """
+    lambda_ = MMR_LAMBDA if lambda_ is None else lambda_
+    if len(groups) <= top_k or any(g["best"].get("vector") is None for g in groups):
+        return groups[:top_k]
+
+    vectors = np.asarray([g["best"]["vector"] for g in groups], dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    vectors = vectors / np.where(norms == 0, 1, norms)
+    similarity = vectors @ vectors.T
+
+    scores = np.asarray([g["best"].get("score", 0.0) for g in groups], dtype=np.float32)
+    spread = scores.max() - scores.min()
+    relevance = (scores - scores.min()) / spread if spread > 0 else np.ones_like(scores)
+
+    selected = [int(np.argmax(relevance))]
+    max_sim = similarity[selected[0]].copy()
+    available = np.ones(len(groups), dtype=bool)
+    available[selected[0]] = False
+    while len(selected) < top_k:
+        mmr = lambda_ * relevance - (1 - lambda_) * max_sim
+        mmr[~available] = -np.inf
+        pick = int(np.argmax(mmr))
+        selected.append(pick)
+        available[pick] = False
+        np.maximum(max_sim, similarity[pick], out=max_sim)
+    return [groups[i] for i in selected]
+
+
+def _merged_snippet(group: Dict) -> str:
+    """Top chunks of an article joined in document order"""
+    chunks = sorted(group["chunks"], key=lambda p: p.get("score", 0.0), reverse=True)[:MAX_CHUNKS_PER_DOC]
+    chunks.sort(key=lambda p: (p.get('payload') or {}).get('chunk_idx', 0))
+    return " ... ".join((p.get('payload') or {}).get('content', '') for p in chunks)[:SNIPPET_MAX_CHARS]
+
+
+async def _dense_points(query: str, limit: int, since: float = None, until: float = None) -> Optional[List[Dict]]:
+    print("Generating query embedding...")
+    query_embedding = await generate_query_embedding_async(query)
+    if not query_embedding:
+        print("Failed to generate query embedding")
+        return None
+    print(f"Generated query embedding with size {len(query_embedding)}")
+    hot = None
+    if HOT_TIER_ENABLED:
+        with span("hot_tier"):
+            hot = await asyncio.to_thread(search_hot_tier, query_embedding, limit, True, since, until)
+        # Recent articles answer the query on their own: skip the network round trip
+        if hot and len(hot) >= limit and hot[-1]["score"] >= HOT_TIER_MIN_SCORE:
+            print(f"Served {len(hot)} dense hits from the hot tier")
+            return hot
+    with span("qdrant_dense"):
+        remote = _points(await search_documents_async(
+            query_embedding, top_k=limit, query_filter=time_filter(since, until)
+        ))
+    return merge_points(hot, remote, limit) if hot else remote
+
+
+async def _sparse_points(query: str, limit: int, since: float = None, until: float = None) -> Optional[List[Dict]]:
+    with span("qdrant_sparse"):
+        return _points(await search_sparse_async(
+            query, top_k=limit, query_filter=time_filter(since, until)
+        ))
+
+
+async def _attach_vectors(groups: List[Dict]) -> None:
+    """
+    Fetch the vectors MMR needs: only each article's best chunk, and only
+    those not already carrying one (hot-tier hits do)
+    """
+    missing = [g["best"]["id"] for g in groups if g["best"].get("vector") is None]
+    if not missing:
+        return
+    with span("qdrant_vectors"):
+        vectors = await retrieve_vectors_async(missing)
+    for group in groups:
+        if group["best"].get("vector") is None:
+            group["best"]["vector"] = vectors.get(group["best"]["id"])
+
+
+def _points(search_result) -> Optional[List[Dict]]:
+    if not search_result:
+        print("Search failed - no result returned")
+        return None
+    status = search_result.get('status')
+    if status != 'ok':
+        print(f"Search returned non-OK status: {status}")
+        if status == 'vector_size_mismatch':
+            print("Vector size mismatch between query and collection")
+        return None
+    return search_result.get('result', {}).get('points', [])
+
+
+async def search_articles(query: str, top_k: int = 3, mode: Optional[str] = None,
+                          since: Optional[float] = None, until: Optional[float] = None) -> List[Dict[str, Any]]:
+    """
+    Search for articles related to a query, optionally restricted to those
+    published between since and until (unix seconds). The window is applied
+    inside Qdrant via the published_at payload index.
+    """
     print(f"\nSearching for articles related to: {query}")
+    mode = mode or SEARCH_MODE
     
     try:
-        # Generate query embedding
-        print("Generating query embedding...")
-        query_embedding = generate_query_embedding(query)
-        if not query_embedding:
-            print("Failed to generate query embedding")
-            return []
-        print(f"Generated query embedding with size {len(query_embedding)}")
+        # Over-fetch chunks so several can collapse into one article
+        limit = top_k * max(MMR_OVERFETCH, 1)
+        if mode == "dense":
+            points = await _dense_points(query, limit, since, until)
+        elif mode == "sparse":
+            points = await _sparse_points(query, limit, since, until)
+        else:
+            # Run both retrievers concurrently and fuse their rankings
+            fetch = limit * max(HYBRID_OVERFETCH, 1)
+            dense, sparse = await asyncio.gather(
+                _dense_points(query, fetch, since, until), _sparse_points(query, fetch, since, until)
+            )
+            ranked, weights = [], []
+            if dense:
+                ranked.append(dense)
+                weights.append(RRF_DENSE_WEIGHT)
+            if sparse:
+                ranked.append(sparse)
+                weights.append(RRF_SPARSE_WEIGHT)
+            points = reciprocal_rank_fusion(ranked, weights)[:limit] if ranked else None
             
-        # Search for similar documents
-        print("Searching for similar documents...")
-        search_result = search_documents(query_embedding, top_k=top_k)
-        if not search_result:
-            print("Search failed - no result returned")
-            return []
-            
-        status = search_result.get('status')
-        if status != 'ok':
-            print(f"Search returned non-OK status: {status}")
-            if status == 'vector_size_mismatch':
-                print("Vector size mismatch between query and collection")
-            return []
-            
-        points = search_result.get('result', {}).get('points', [])
         if not points:
             print("No matching documents found in search results")
             return []
             
         print(f"Found {len(points)} matching points")
         
+        # Prefer fresher articles among comparably relevant ones
+        points = apply_time_decay(points)
+        
+        # One result per article, diversified with MMR
+        groups = group_by_document(points)
+        if len(groups) > top_k:
+            await _attach_vectors(groups)
+        groups = mmr_select(groups, top_k)
+        
         # Format results
         articles = []
-        for point in points:
+        for group in groups:
+            point = group["best"]
             payload = point.get('payload', {})
             if not payload:
                 print(f"Warning: Missing payload for point {point.get('id')}")
                 continue
                 
             articles.append({
+                'id': point.get('id'),
+                'doc_id': payload.get('doc_id', ''),
                 'title': payload.get('title', 'No title'),
-                'content': payload.get('content', 'No content'),
+                'content': _merged_snippet(group),
                 'date': payload.get('date', ''),
                 'url': payload.get('url', ''),
-                'score': point.get('score', 0.0)
+                'score': point.get('score', 0.0),
+                'matching_chunks': len(group["chunks"])
             })
             
         print(f"Successfully formatted {len(articles)} articles")
@@ -58,19 +275,3 @@ async def search_articles(query: str, top_k: int = 3) -> List[Dict[str, Any]]:
     except Exception as e:
         print(f"Error in search_articles: {str(e)}")
         return []
-        best_score = max(chunk["score"] for chunk in chunks)
-        
-        # Combine chunks into context (limit to first 500 characters)
-        context = " ... ".join(chunk["chunk"] for chunk in chunks)[:500]
-        
-        final_results.append({
-            "title": chunks[0]["title"],
-            "url": chunks[0]["url"],
-            "content": context,
-            "score": best_score,
-            "matching_chunks": len(chunks)
-        })
-    
-    # Sort final results by score and limit to top_k
-    final_results.sort(key=lambda x: x["score"], reverse=True)
-    return final_results[:top_k]
\ No newline at end of file
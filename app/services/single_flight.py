@@ -0,0 +1,116 @@
+import asyncio
+import hashlib
+import os
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict
+from dotenv import load_dotenv
+
+from ..db.redis_cache import (
+    acquire_lock_async, lock_exists_async, release_lock_async,
+    get_bytes_async, set_bytes_async, serialize, deserialize
+)
+from .embedding_cache import normalize_query
+from .metrics import COALESCED_REQUESTS
+
+load_dotenv()
+
+# Concurrent identical requests share one computation within a worker
+COALESCE_ENABLED = os.getenv('COALESCE_ENABLED', 'true').lower() == 'true'
+# ...and across workers through a Redis lease plus a short-lived result key
+COALESCE_DISTRIBUTED = os.getenv('COALESCE_DISTRIBUTED', 'false').lower() == 'true'
+# Lease length; should cover a full retrieval + generation
+COALESCE_LEASE_MS = int(os.getenv('COALESCE_LEASE_MS', '30000'))
+COALESCE_POLL_MS = int(os.getenv('COALESCE_POLL_MS', '50'))
+# How long the leader's result stays readable for followers on other workers
+COALESCE_RESULT_TTL = int(os.getenv('COALESCE_RESULT_TTL', '5'))
+
+_inflight: Dict[str, asyncio.Future] = {}
+_stats = {"leaders": 0, "local_followers": 0, "remote_followers": 0}
+
+
+def coalesce_key(query: str, **params) -> str:
+    """Key for a normalized query plus everything else that changes the answer"""
+    parts = [normalize_query(query)] + [f"{name}={params[name]}" for name in sorted(params)]
+    return hashlib.sha1("\0".join(parts).encode('utf-8')).hexdigest()
+
+
+async def _wait_for_remote(key: str):
+    """
+    Poll for another worker's result while it holds the lease. Returns the
+    result, or None if the lease ended without one (leader failed or expired).
+    """
+    lock_key, result_key = f"sf:lock:{key}", f"sf:result:{key}"
+    deadline = time.monotonic() + COALESCE_LEASE_MS / 1000
+    while time.monotonic() < deadline:
+        data = await get_bytes_async(result_key)
+        if data is not None:
+            return deserialize(data)
+        if not await lock_exists_async(lock_key):
+            # Released between our two reads: the result may have just landed
+            data = await get_bytes_async(result_key)
+            return deserialize(data) if data is not None else None
+        await asyncio.sleep(COALESCE_POLL_MS / 1000)
+    return None
+
+
+async def _run_distributed(key: str, compute: Callable[[], Awaitable[Any]]):
+    lock_key, result_key = f"sf:lock:{key}", f"sf:result:{key}"
+    token = uuid.uuid4().hex
+    if not await acquire_lock_async(lock_key, token, COALESCE_LEASE_MS):
+        result = await _wait_for_remote(key)
+        if result is not None:
+            _stats["remote_followers"] += 1
+            COALESCED_REQUESTS.inc(role="remote_follower")
+            return result
+        # Leader gave up: compute ourselves rather than wait again
+        return await compute()
+    try:
+        result = await compute()
+        await set_bytes_async(result_key, serialize(result), COALESCE_RESULT_TTL)
+        return result
+    finally:
+        await release_lock_async(lock_key, token)
+
+
+async def single_flight(key: str, compute: Callable[[], Awaitable[Any]]):
+    """
+    Run compute once for all concurrent callers with the same key and give
+    each of them its result (or exception). With COALESCE_DISTRIBUTED the
+    leader on one worker also serves callers on other workers; its result
+    must then be serializable with the cache serializer.
+    """
+    if not COALESCE_ENABLED:
+        return await compute()
+
+    future = _inflight.get(key)
+    if future is not None:
+        _stats["local_followers"] += 1
+        COALESCED_REQUESTS.inc(role="local_follower")
+        # Shield so a cancelled follower doesn't cancel the shared computation
+        return await asyncio.shield(future)
+
+    _stats["leaders"] += 1
+    COALESCED_REQUESTS.inc(role="leader")
+    run = _run_distributed(key, compute) if COALESCE_DISTRIBUTED else compute()
+    future = _inflight[key] = asyncio.ensure_future(run)
+    try:
+        return await asyncio.shield(future)
+    finally:
+        if future.done():
+            _inflight.pop(key, None)
+        else:
+            # Leader request cancelled: drop the entry once the work finishes,
+            # retrieving its exception in case no follower awaits it
+            future.add_done_callback(lambda done: _finished(key, done))
+
+
+def _finished(key: str, future: asyncio.Future) -> None:
+    _inflight.pop(key, None)
+    if not future.cancelled():
+        future.exception()
+
+
+def get_single_flight_stats():
+    """How many requests computed an answer vs. reused one in flight"""
+    return {**_stats, "in_flight": len(_inflight)}
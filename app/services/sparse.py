@@ -0,0 +1,57 @@
+import os
+import re
+import zlib
+from collections import Counter
+from typing import Dict, List, Tuple
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# BM25 term-frequency saturation parameters. IDF is applied by Qdrant
+# (sparse vector modifier=idf), so only the TF part is computed here.
+BM25_K1 = float(os.getenv('BM25_K1', '1.2'))
+BM25_B = float(os.getenv('BM25_B', '0.75'))
+# Average document length in tokens; chunks are bounded by CHUNK_MAX_TOKENS
+BM25_AVG_DOC_LEN = float(os.getenv('BM25_AVG_DOC_LEN', '180'))
+
+# Keep tickers, CVE IDs and version numbers together: "CVE-2025-1234", "gpt-4o", "3.5"
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:[-.][a-z0-9]+)*")
+
+_STOPWORDS = frozenset("""
+a an and are as at be but by for from has have in into is it its of on or that the their
+this to was were will with what which who how about after over than then there these they
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens, minus stopwords"""
+    return [token for token in _TOKEN_RE.findall(text.lower()) if token not in _STOPWORDS]
+
+
+def term_id(token: str) -> int:
+    """Stable 32-bit term id (the same in every process and run)"""
+    return zlib.crc32(token.encode('utf-8'))
+
+
+def _to_sparse(weights: Dict[int, float]) -> Tuple[List[int], List[float]]:
+    indices = sorted(weights)
+    return indices, [weights[i] for i in indices]
+
+
+def document_sparse_vector(text: str) -> Tuple[List[int], List[float]]:
+    """BM25 term weights for a document chunk, as (indices, values)"""
+    tokens = tokenize(text)
+    if not tokens:
+        return [], []
+    norm = BM25_K1 * (1 - BM25_B + BM25_B * len(tokens) / BM25_AVG_DOC_LEN)
+    weights: Dict[int, float] = {}
+    for token, tf in Counter(tokens).items():
+        tid = term_id(token)
+        # crc32 collisions are rare; merge rather than drop
+        weights[tid] = weights.get(tid, 0.0) + tf * (BM25_K1 + 1) / (tf + norm)
+    return _to_sparse(weights)
+
+
+def query_sparse_vector(text: str) -> Tuple[List[int], List[float]]:
+    """Query vector: weight 1 per distinct term (Qdrant supplies the IDF)"""
+    return _to_sparse({term_id(token): 1.0 for token in set(tokenize(text))})
@@ -0,0 +1,225 @@
+import asyncio
+import os
+import socket
+import uuid
+from datetime import datetime
+from typing import Dict, List, Tuple
+import psycopg2
+import redis
+from dotenv import load_dotenv
+
+from ..db.redis_cache import redis_client
+from ..db.sql import delete_chat_messages, save_chat_messages_batch
+
+load_dotenv()
+
+# When enabled, chat messages are queued on a Redis stream on the request path
+# and written to PostgreSQL in batches by a background flusher
+SESSION_WRITE_BEHIND = os.getenv('SESSION_WRITE_BEHIND', 'false').lower() == 'true'
+WRITE_BEHIND_BATCH = int(os.getenv('WRITE_BEHIND_BATCH', '500'))
+WRITE_BEHIND_INTERVAL_MS = int(os.getenv('WRITE_BEHIND_INTERVAL_MS', '1000'))
+# Entries delivered to a consumer that hasn't acked them for this long are re-claimed
+WRITE_BEHIND_CLAIM_IDLE_MS = int(os.getenv('WRITE_BEHIND_CLAIM_IDLE_MS', '60000'))
+# How long a session reset keeps filtering out messages queued before it
+WRITE_BEHIND_RESET_TTL = int(os.getenv('WRITE_BEHIND_RESET_TTL', '86400'))
+# Entries that still fail on their own after this many deliveries are moved to
+# the dead-letter stream so they stop holding up the rest
+WRITE_BEHIND_MAX_DELIVERIES = int(os.getenv('WRITE_BEHIND_MAX_DELIVERIES', '5'))
+
+STREAM_KEY = "chat:writebehind"
+DEAD_LETTER_KEY = "chat:writebehind:dead"
+GROUP_NAME = "pg-writer"
+CONSUMER_NAME = f"{socket.gethostname()}-{os.getpid()}"
+
+_flusher_task = None
+
+
+def _reset_key(session_id: str) -> str:
+    return f"chat:reset:{session_id}"
+
+
+def enqueue_chat_message(session_id: str, role: str, content: str, message_key: str = None) -> str:
+    """Queue a message for PostgreSQL and return its idempotency key"""
+    message_key = message_key or str(uuid.uuid4())
+    redis_client.xadd(STREAM_KEY, {
+        "session_id": session_id,
+        "role": role,
+        "content": content,
+        "timestamp": datetime.utcnow().isoformat(),
+        "message_key": message_key
+    })
+    return message_key
+
+
+# Append a reset marker entry and record its stream ID as the session's reset
+# point in one step, so every message queued before it has a smaller ID
+_RESET_SCRIPT = """
+local id = redis.call('xadd', KEYS[1], '*', 'op', 'reset', 'session_id', ARGV[1])
+redis.call('set', KEYS[2], id, 'ex', ARGV[2])
+return id
+"""
+
+
+def enqueue_chat_reset(session_id: str) -> str:
+    """
+    Record a reset point for the session: flushers drop, or delete again if
+    they already wrote them, messages queued before it. Points are stream
+    entry IDs, which Redis assigns in order, so no host clocks are compared.
+    Call before deleting the session's rows. Returns the reset point.
+    """
+    return redis_client.eval(
+        _RESET_SCRIPT, 2, STREAM_KEY, _reset_key(session_id), session_id, WRITE_BEHIND_RESET_TTL
+    )
+
+
+def _stream_id(entry_id: str) -> Tuple[int, int]:
+    millis, _, seq = entry_id.partition("-")
+    return int(millis), int(seq or 0)
+
+
+def _ensure_group():
+    try:
+        redis_client.xgroup_create(STREAM_KEY, GROUP_NAME, id="0", mkstream=True)
+    except Exception as e:
+        if "BUSYGROUP" not in str(e):
+            raise
+
+
+def _reset_before(entries: List) -> List:
+    """The message entries queued before their session's latest reset point"""
+    session_ids = sorted({fields.get("session_id") for _, fields in entries})
+    if not session_ids:
+        return []
+    resets = dict(zip(session_ids, redis_client.mget([_reset_key(s) for s in session_ids])))
+    return [
+        (entry_id, fields) for entry_id, fields in entries
+        if resets[fields.get("session_id")]
+        and _stream_id(entry_id) < _stream_id(resets[fields.get("session_id")])
+    ]
+
+
+def _write(entries: List) -> int:
+    """Write stream entries to PostgreSQL, then ack and delete them"""
+    if not entries:
+        return 0
+    # Reset markers only carry their stream ID, recorded when they were added
+    messages = [(entry_id, fields) for entry_id, fields in entries if fields.get("op") != "reset"]
+    dropped = {entry_id for entry_id, _ in _reset_before(messages)}
+    save_chat_messages_batch([fields for entry_id, fields in messages if entry_id not in dropped])
+    # A reset recorded while this batch was being written deletes the session's
+    # rows before it could see ours: check again now that they are committed
+    late = [fields.get("message_key") for entry_id, fields in _reset_before(messages) if entry_id not in dropped]
+    if late:
+        delete_chat_messages(late)
+    ids = [entry_id for entry_id, _ in entries]
+    pipe = redis_client.pipeline(transaction=False)
+    pipe.xack(STREAM_KEY, GROUP_NAME, *ids)
+    pipe.xdel(STREAM_KEY, *ids)
+    pipe.execute()
+    return len(entries)
+
+
+# Failures that say nothing about the entries themselves: leave them pending
+_OUTAGE_ERRORS = (psycopg2.OperationalError, psycopg2.InterfaceError, redis.ConnectionError)
+
+
+def _entry_failed(entry_id: str, fields: Dict, error: Exception) -> None:
+    """Leave a failed entry pending for re-claim, or dead-letter it once it has used up its deliveries"""
+    pending = redis_client.xpending_range(STREAM_KEY, GROUP_NAME, min=entry_id, max=entry_id, count=1)
+    deliveries = pending[0]["times_delivered"] if pending else 0
+    if deliveries < WRITE_BEHIND_MAX_DELIVERIES:
+        print(f"Write-behind entry {entry_id} failed (delivery {deliveries}): {str(error)}")
+        return
+    pipe = redis_client.pipeline(transaction=True)
+    pipe.xadd(DEAD_LETTER_KEY, {**fields, "entry_id": entry_id, "error": str(error)})
+    pipe.xack(STREAM_KEY, GROUP_NAME, entry_id)
+    pipe.xdel(STREAM_KEY, entry_id)
+    pipe.execute()
+    print(f"Write-behind entry {entry_id} moved to {DEAD_LETTER_KEY} after {deliveries} deliveries: {str(error)}")
+
+
+def _write_isolated(entries: List) -> int:
+    """
+    Write a batch, falling back to one entry at a time when it fails so a bad
+    entry only holds up itself
+    """
+    try:
+        return _write(entries)
+    except _OUTAGE_ERRORS:
+        raise
+    except Exception as e:
+        if len(entries) == 1:
+            _entry_failed(*entries[0], e)
+            return 0
+        print(f"Write-behind batch failed, writing entries one at a time: {str(e)}")
+    written = 0
+    for entry in entries:
+        try:
+            written += _write([entry])
+        except _OUTAGE_ERRORS:
+            raise
+        except Exception as e:
+            _entry_failed(*entry, e)
+    return written
+
+
+def flush_once(block_ms: int = 0) -> int:
+    """
+    Move one batch from the stream to PostgreSQL. Entries are acked only after
+    the insert commits (at-least-once); message_key makes redelivery idempotent.
+    Returns the number of entries written.
+    """
+    # Entries left unacked by a crashed flusher come first
+    _, claimed, *_ = redis_client.xautoclaim(
+        STREAM_KEY, GROUP_NAME, CONSUMER_NAME,
+        min_idle_time=WRITE_BEHIND_CLAIM_IDLE_MS, start_id="0-0", count=WRITE_BEHIND_BATCH
+    )
+    written = _write_isolated([entry for entry in claimed if entry[1]])
+
+    response = redis_client.xreadgroup(
+        GROUP_NAME, CONSUMER_NAME, {STREAM_KEY: ">"},
+        count=WRITE_BEHIND_BATCH, block=block_ms or None
+    )
+    for _, entries in response or []:
+        written += _write_isolated(entries)
+    return written
+
+
+async def _flush_loop():
+    await asyncio.to_thread(_ensure_group)
+    while True:
+        try:
+            written = await asyncio.to_thread(flush_once, WRITE_BEHIND_INTERVAL_MS)
+            if written:
+                print(f"Write-behind flushed {written} chat messages")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Write-behind flush error: {str(e)}")
+            await asyncio.sleep(WRITE_BEHIND_INTERVAL_MS / 1000)
+
+
+def start_flusher():
+    """Start the background flusher (no-op unless SESSION_WRITE_BEHIND is set)"""
+    global _flusher_task
+    if SESSION_WRITE_BEHIND and _flusher_task is None:
+        _flusher_task = asyncio.create_task(_flush_loop())
+        print("Write-behind flusher started")
+
+
+async def stop_flusher():
+    """Stop the flusher and drain what is queued"""
+    global _flusher_task
+    if _flusher_task is None:
+        return
+    _flusher_task.cancel()
+    try:
+        await _flusher_task
+    except asyncio.CancelledError:
+        pass
+    _flusher_task = None
+    try:
+        while await asyncio.to_thread(flush_once):
+            pass
+    except Exception as e:
+        print(f"Write-behind final flush error: {str(e)}")
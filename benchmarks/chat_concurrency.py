@@ -0,0 +1,77 @@
+"""
+Concurrency benchmark for POST /api/chat.
+
+Fires a fixed number of chat requests at a running server with N concurrent
+clients and reports requests/sec and latency percentiles. Run it once against
+a build with the blocking pipeline and once against the async one to compare:
+
+    uvicorn app.main:app --port 8000
+    python benchmarks/chat_concurrency.py --url http://localhost:8000 --concurrency 50 --requests 500
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+
+QUERIES = [
+    "latest AI news",
+    "What happened with Apple this week?",
+    "semiconductor export restrictions",
+    "cybersecurity breaches",
+    "electric vehicle sales",
+]
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def worker(client, url, queue, latencies, errors):
+    while True:
+        try:
+            i = queue.get_nowait()
+        except asyncio.QueueEmpty:
+            return
+        payload = {"message": QUERIES[i % len(QUERIES)], "session_id": f"bench-{i}"}
+        start = time.perf_counter()
+        try:
+            response = await client.post(f"{url}/api/chat", json=payload)
+            if response.status_code != 200:
+                errors.append(response.status_code)
+        except Exception as e:
+            errors.append(str(e))
+        latencies.append(time.perf_counter() - start)
+
+
+async def run(url, concurrency, total):
+    queue = asyncio.Queue()
+    for i in range(total):
+        queue.put_nowait(i)
+
+    latencies, errors = [], []
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(timeout=120.0, limits=limits) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(client, url, queue, latencies, errors) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    print(f"Requests:    {total} ({len(errors)} errors)")
+    print(f"Concurrency: {concurrency}")
+    print(f"Elapsed:     {elapsed:.2f}s")
+    print(f"Throughput:  {total / elapsed:.1f} req/s")
+    print(f"p50 latency: {percentile(latencies, 50) * 1000:.0f} ms")
+    print(f"p99 latency: {percentile(latencies, 99) * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=500)
+    args = parser.parse_args()
+    asyncio.run(run(args.url.rstrip("/"), args.concurrency, args.requests))
@@ -0,0 +1,58 @@
+"""
+Micro-benchmark of chunker throughput in MB/s.
+
+    python benchmarks/chunker_throughput.py --articles 2000 --max-tokens 256 --overlap 32
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.services.chunking import chunk_articles  # noqa: E402
+
+WORDS = ("market chip earnings regulator launch model cloud security breach startup "
+         "funding quarter revenue device battery network outage update release").split()
+
+
+def make_article(rng, i):
+    paragraphs = []
+    for _ in range(rng.randint(3, 12)):
+        sentences = []
+        for _ in range(rng.randint(2, 8)):
+            words = [rng.choice(WORDS) for _ in range(rng.randint(6, 30))]
+            sentences.append(" ".join(words).capitalize() + rng.choice(".!?"))
+        paragraphs.append(" ".join(sentences))
+    return {"title": f"Article {i}", "date": "", "url": f"https://example.com/{i}",
+            "content": "\n\n".join(paragraphs)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--articles", type=int, default=2000)
+    parser.add_argument("--max-tokens", type=int, default=256)
+    parser.add_argument("--overlap", type=int, default=32)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    articles = [make_article(rng, i) for i in range(args.articles)]
+    total_bytes = sum(len(a["content"].encode("utf-8")) for a in articles)
+
+    best = float("inf")
+    chunks = 0
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        chunks = sum(1 for _ in chunk_articles(articles, args.max_tokens, args.overlap))
+        best = min(best, time.perf_counter() - start)
+
+    print(f"Input:      {args.articles} articles, {total_bytes / 1e6:.2f} MB")
+    print(f"Chunks:     {chunks} (max {args.max_tokens} tokens, overlap {args.overlap})")
+    print(f"Best time:  {best * 1000:.1f} ms")
+    print(f"Throughput: {total_bytes / 1e6 / best:.2f} MB/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Compare hot-tier (in-process NumPy) search latency with Qdrant search.
+
+For each corpus size, writes a hot tier of random vectors to a temporary
+directory, loads the same points into Qdrant and times top-k queries on both.
+Qdrant runs in in-process local mode by default; point QDRANT_URL at the real
+cluster to include the network round trip the hot tier avoids.
+
+    python benchmarks/hot_tier_search.py --sizes 1000,10000,50000 --queries 200
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+os.environ.setdefault("QDRANT_URL", ":memory:")
+os.environ.setdefault("QDRANT_COLLECTION_NAME", "bench_hot_tier")
+os.environ.setdefault("VECTOR_SIZE", "1024")
+os.environ["HOT_TIER_DIR"] = tempfile.mkdtemp(prefix="hot_tier_bench_")
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import numpy as np  # noqa: E402
+
+from app.db import vector_db  # noqa: E402
+from app.services import hot_tier  # noqa: E402
+
+
+def make_documents(count, dim, seed=7):
+    rng = np.random.default_rng(seed)
+    now = datetime.utcnow()
+    for i in range(count):
+        yield {
+            "doc_id": f"doc-{i}",
+            "doc_idx": i,
+            "chunk_idx": 0,
+            "title": f"Article {i}",
+            "date": now,
+            "content": f"Synthetic article {i}.",
+            "url": f"https://example.com/{i}",
+            "embedding": rng.standard_normal(dim, dtype=np.float32).tolist()
+        }
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    return (samples[len(samples) // 2] * 1000,
+            samples[min(int(len(samples) * 0.99), len(samples) - 1)] * 1000)
+
+
+def time_queries(search, queries):
+    samples = []
+    for query in queries:
+        start = time.perf_counter()
+        search(query)
+        samples.append(time.perf_counter() - start)
+    return percentiles(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", default="1000,10000,50000")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=20)
+    args = parser.parse_args()
+    dim = vector_db.VECTOR_SIZE
+    rng = np.random.default_rng(11)
+    queries = [rng.standard_normal(dim, dtype=np.float32).tolist() for _ in range(args.queries)]
+
+    print(f"Qdrant: {vector_db.QDRANT_URL}, dim {dim}, k={args.k}, {args.queries} queries per size")
+    print(f"{'points':>8}  {'hot p50':>9} {'hot p99':>9}  {'qdrant p50':>10} {'qdrant p99':>10}  {'overlap@k':>9}")
+    for size in (int(s) for s in args.sizes.split(",")):
+        docs = list(make_documents(size, dim))
+
+        vector_db.client.delete_collection(vector_db.QDRANT_COLLECTION_NAME)
+        vector_db._collection_ready = False
+        vector_db.ensure_collection_exists()
+        vector_db.bulk_insert_documents(iter(docs))
+
+        # Bootstrap from Qdrant, as the first ingestion with the hot tier enabled does
+        hot_tier.HOT_TIER_MAX_POINTS = max(hot_tier.HOT_TIER_MAX_POINTS, size)
+        hot_tier.rebuild_hot_tier()
+
+        hot_p50, hot_p99 = time_queries(lambda q: hot_tier.search_hot_tier(q, args.k), queries)
+        remote_p50, remote_p99 = time_queries(lambda q: vector_db.search_documents(q, top_k=args.k), queries)
+
+        # Sanity check that both tiers return the same neighbours
+        overlap = []
+        for query in queries[:20]:
+            hot_ids = {p["id"] for p in hot_tier.search_hot_tier(query, args.k)}
+            remote_ids = {p["id"] for p in vector_db.search_documents(query, top_k=args.k)["result"]["points"]}
+            overlap.append(len(hot_ids & remote_ids) / args.k)
+
+        print(f"{size:>8}  {hot_p50:>7.2f}ms {hot_p99:>7.2f}ms  {remote_p50:>8.2f}ms {remote_p99:>8.2f}ms  "
+              f"{sum(overlap) / len(overlap):>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
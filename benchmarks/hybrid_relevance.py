@@ -0,0 +1,78 @@
+"""
+Offline relevance benchmark for dense-only, sparse-only and hybrid retrieval.
+
+Uses known-item queries built from the collection itself: for a sample of
+stored chunks, the article title is the query and the article's doc_id is
+the relevant result. Reports recall@k and latency per mode. Needs the Qdrant
+and Jina credentials from the environment; query embeddings are warmed into
+the cache first so dense latency reflects retrieval, not Jina.
+
+    python benchmarks/hybrid_relevance.py --queries 200 --k 5
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.db import vector_db  # noqa: E402
+from app.services.search import search_articles  # noqa: E402
+
+
+def known_item_queries(count):
+    queries, seen = [], set()
+    offset = None
+    while len(queries) < count:
+        points, offset = vector_db.client.scroll(
+            collection_name=vector_db.QDRANT_COLLECTION_NAME,
+            limit=256, offset=offset, with_payload=["title", "doc_id"], with_vectors=False
+        )
+        for point in points:
+            doc_id, title = point.payload.get("doc_id"), point.payload.get("title")
+            if doc_id and title and doc_id not in seen:
+                seen.add(doc_id)
+                queries.append((title, doc_id))
+        if offset is None:
+            break
+    return queries[:count]
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))] if ordered else 0.0
+
+
+async def evaluate(queries, mode, k):
+    hits, latencies = 0, []
+    for query, doc_id in queries:
+        start = time.perf_counter()
+        articles = await search_articles(query, top_k=k, mode=mode)
+        latencies.append(time.perf_counter() - start)
+        hits += any(article.get("doc_id") == doc_id for article in articles)
+    return hits / len(queries), latencies
+
+
+async def main(args):
+    queries = known_item_queries(args.queries)
+    if not queries:
+        print("Collection has no points with doc_id; ingest some articles first")
+        return
+    # Warm the query embedding cache so dense latency isn't dominated by the first Jina calls
+    for query, _ in queries:
+        await search_articles(query, top_k=args.k, mode="dense")
+
+    print(f"{len(queries)} known-item queries, k={args.k}")
+    print(f"{'mode':<8} {'recall@k':>9} {'p50 ms':>8} {'p95 ms':>8}")
+    for mode in ("dense", "sparse", "hybrid"):
+        recall, latencies = await evaluate(queries, mode, args.k)
+        print(f"{mode:<8} {recall:>9.3f} {percentile(latencies, 50) * 1000:>8.1f} "
+              f"{percentile(latencies, 95) * 1000:>8.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,73 @@
+"""
+Benchmark single-call insert_documents against bulk_insert_documents.
+
+Runs against Qdrant's in-process local mode by default, so no server is
+needed; point QDRANT_URL at a real instance to measure network effects.
+
+    python benchmarks/qdrant_bulk_upsert.py --points 20000 --batch-sizes 64,256,1024 --parallel 1,4
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+os.environ.setdefault("QDRANT_URL", ":memory:")
+os.environ.setdefault("QDRANT_COLLECTION_NAME", "bench_articles")
+os.environ.setdefault("VECTOR_SIZE", "1024")
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.db import vector_db  # noqa: E402
+
+
+def make_documents(count, dim, seed=7):
+    rng = random.Random(seed)
+    for i in range(count):
+        yield {
+            "doc_id": f"doc-{i // 4}",
+            "doc_idx": i // 4,
+            "chunk_idx": i % 4,
+            "title": f"Article {i // 4}",
+            "date": "2025-01-01T00:00:00Z",
+            "content": f"Chunk {i} of a synthetic article.",
+            "url": f"https://example.com/{i // 4}",
+            "embedding": [rng.random() for _ in range(dim)]
+        }
+
+
+def reset_collection():
+    vector_db.client.delete_collection(vector_db.QDRANT_COLLECTION_NAME)
+    vector_db._collection_ready = False
+    vector_db.ensure_collection_exists()
+
+
+def timed(label, points, fn):
+    reset_collection()
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<40} {elapsed:>7.2f}s  {points / elapsed:>9.0f} points/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--points", type=int, default=20000)
+    parser.add_argument("--batch-sizes", default="64,256,1024")
+    parser.add_argument("--parallel", default="1,4")
+    args = parser.parse_args()
+    dim = vector_db.VECTOR_SIZE
+
+    print(f"Qdrant: {vector_db.QDRANT_URL}, {args.points} points of dim {dim}")
+    docs = list(make_documents(args.points, dim))
+
+    timed("insert_documents (single upsert)", args.points, lambda: vector_db.insert_documents(docs))
+    for parallel in (int(p) for p in args.parallel.split(",")):
+        for batch_size in (int(b) for b in args.batch_sizes.split(",")):
+            for wait in (True, False):
+                label = f"bulk batch={batch_size} parallel={parallel} wait={wait}"
+                timed(label, args.points, lambda: vector_db.bulk_insert_documents(
+                    iter(docs), batch_size=batch_size, parallel=parallel, wait=wait))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Compare Qdrant vector storage settings: recall@k, latency and estimated memory.
+
+For each quantization mode (none, scalar, binary) a fresh collection is
+loaded with the same synthetic clustered vectors, then queried with each
+oversampling factor. Recall@k is measured against exact (brute-force) search
+on the same collection. Memory is not measured: it is an estimate of the RAM
+vectors take, the quantized copy plus the float32 originals unless they are
+on disk, and leaves out the HNSW graph and payloads.
+
+Quantization and HNSW only exist in the Qdrant server, not in local mode, so
+this needs a running instance (e.g. docker run -p 6333:6333 qdrant/qdrant).
+
+    python benchmarks/qdrant_quantization.py --points 100000 --modes none,scalar,binary --oversampling 1,2,4
+"""
+import argparse
+import os
+import sys
+import time
+
+os.environ.setdefault("QDRANT_URL", "http://localhost:6333")
+os.environ.setdefault("QDRANT_COLLECTION_NAME", "bench_quantization")
+os.environ.setdefault("VECTOR_SIZE", "1024")
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import numpy as np  # noqa: E402
+
+from app.db import vector_db  # noqa: E402
+
+BYTES_PER_DIM = {"none": 0.0, "scalar": 1.0, "binary": 1 / 8}
+
+
+def clustered_vectors(count, dim, clusters=200, seed=7):
+    """Topic-like data: points scattered around cluster centres, like embeddings of related articles"""
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((clusters, dim), dtype=np.float32)
+    labels = rng.integers(0, clusters, count)
+    return centres[labels] + 0.6 * rng.standard_normal((count, dim), dtype=np.float32)
+
+
+def make_documents(vectors):
+    for i, vector in enumerate(vectors):
+        yield {
+            "doc_id": f"doc-{i}",
+            "doc_idx": i,
+            "chunk_idx": 0,
+            "title": f"Article {i}",
+            "date": "2025-01-01T00:00:00Z",
+            "content": f"Synthetic article {i}.",
+            "url": f"https://example.com/{i}",
+            "embedding": vector.tolist()
+        }
+
+
+def load_collection(mode, vectors):
+    vector_db.QDRANT_QUANTIZATION = mode
+    vector_db.QDRANT_VECTORS_ON_DISK = mode != "none"
+    vector_db.client.delete_collection(vector_db.QDRANT_COLLECTION_NAME)
+    vector_db._collection_ready = False
+    vector_db.ensure_collection_exists()
+    vector_db.bulk_insert_documents(make_documents(vectors))
+    # Wait for indexing and quantization to finish before timing searches
+    while vector_db.client.get_collection(vector_db.QDRANT_COLLECTION_NAME).status != "green":
+        time.sleep(1)
+
+
+def ids(result):
+    return [p["id"] for p in result["result"]["points"]]
+
+
+def estimated_memory_mb(mode, count, dim):
+    quantized = BYTES_PER_DIM[mode] * dim * count
+    originals = 0 if vector_db.QDRANT_VECTORS_ON_DISK else 4 * dim * count
+    return (quantized + originals) / 2 ** 20
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--points", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--modes", default="none,scalar,binary")
+    parser.add_argument("--oversampling", default="1,2,4")
+    parser.add_argument("--hnsw-ef", type=int, default=128)
+    args = parser.parse_args()
+    dim = vector_db.VECTOR_SIZE
+
+    vectors = clustered_vectors(args.points, dim)
+    rng = np.random.default_rng(11)
+    queries = vectors[rng.integers(0, args.points, args.queries)]
+    queries = (queries + 0.3 * rng.standard_normal(queries.shape, dtype=np.float32)).tolist()
+
+    print(f"Qdrant: {vector_db.QDRANT_URL}, {args.points} points of dim {dim}, k={args.k}, hnsw_ef={args.hnsw_ef}")
+    print(f"{'mode':<8} {'oversample':>10} {'recall@k':>9} {'p50':>9} {'p99':>9} {'est. vector RAM':>16}")
+    for mode in args.modes.split(","):
+        load_collection(mode, vectors)
+        exact = [ids(vector_db.search_documents(q, top_k=args.k, params=vector_db.search_params(exact=True)))
+                 for q in queries]
+        for oversampling in (float(o) for o in args.oversampling.split(",")):
+            params = vector_db.search_params(hnsw_ef=args.hnsw_ef, oversampling=oversampling, rescore=True)
+            samples, hits = [], 0
+            for query, truth in zip(queries, exact):
+                start = time.perf_counter()
+                found = ids(vector_db.search_documents(query, top_k=args.k, params=params))
+                samples.append(time.perf_counter() - start)
+                hits += len(set(found) & set(truth))
+            samples.sort()
+            p50 = samples[len(samples) // 2] * 1000
+            p99 = samples[min(int(len(samples) * 0.99), len(samples) - 1)] * 1000
+            print(f"{mode:<8} {oversampling:>10.1f} {hits / (args.k * len(queries)):>9.3f} "
+                  f"{p50:>7.2f}ms {p99:>7.2f}ms {estimated_memory_mb(mode, args.points, dim):>14.1f}MB")
+            if mode == "none":
+                # Oversampling only applies to quantized collections
+                break
+
+
+if __name__ == "__main__":
+    main()
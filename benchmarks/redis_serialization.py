@@ -0,0 +1,76 @@
+"""
+Micro-benchmark of cache serialization and Redis round-trip cost.
+
+Compares every registered serializer (plus raw float32 for embeddings) on
+typical payloads: a session message, an embedding vector and an answer with
+its news_context. Round trips are measured only with --round-trip, against
+the Redis configured in the environment.
+
+    python benchmarks/redis_serialization.py --iterations 20000 --round-trip
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.db import redis_cache  # noqa: E402
+from app.services.embedding_cache import encode_vector, decode_vector  # noqa: E402
+
+
+def payloads():
+    rng = random.Random(3)
+    message = {"id": 123456, "role": "assistant", "content": "Nvidia reported record data-center revenue. " * 8}
+    embedding = [rng.uniform(-1, 1) for _ in range(1024)]
+    answer = {
+        "answer": "Here is a summary of the latest technology news. " * 12,
+        "news_context": [
+            {"title": f"Article {i}", "content": "Lorem ipsum dolor sit amet. " * 40,
+             "url": f"https://example.com/{i}", "relevance_score": rng.random()}
+            for i in range(5)
+        ]
+    }
+    return {"session message": message, "embedding (1024d)": embedding, "answer + context": answer}
+
+
+def per_op_us(fn, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=20000)
+    parser.add_argument("--round-trip", action="store_true")
+    args = parser.parse_args()
+
+    print(f"{'payload':<20} {'format':<10} {'bytes':>8} {'dump us':>9} {'load us':>9}"
+          + (f" {'SET+GET us':>11}" if args.round_trip else ""))
+    for label, value in payloads().items():
+        formats = {name: pair for name, pair in redis_cache.SERIALIZERS.items()}
+        if isinstance(value, list):
+            formats["float32"] = (encode_vector, decode_vector)
+        for name, (dumps, loads) in formats.items():
+            data = dumps(value)
+            row = (f"{label:<20} {name:<10} {len(data):>8} "
+                   f"{per_op_us(lambda: dumps(value), args.iterations):>9.1f} "
+                   f"{per_op_us(lambda: loads(data), args.iterations):>9.1f}")
+            if args.round_trip:
+                key = f"bench:serialization:{name}"
+                client = redis_cache.binary_client
+
+                def round_trip():
+                    client.set(key, dumps(value))
+                    loads(client.get(key))
+
+                row += f" {per_op_us(round_trip, max(args.iterations // 20, 100)):>11.1f}"
+                client.delete(key)
+            print(row)
+
+
+if __name__ == "__main__":
+    main()
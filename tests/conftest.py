@@ -0,0 +1,9 @@
+import os
+import sys
+
+# Modules read their settings at import time; keep tests off real services
+os.environ.setdefault("QDRANT_URL", ":memory:")
+os.environ.setdefault("REDIS_HOST", "localhost")
+os.environ.setdefault("REDIS_PORT", "6379")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
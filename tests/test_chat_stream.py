@@ -0,0 +1,13 @@
+from app.routes.chat import format_news_context, sse_event
+
+
+def test_sse_event_encodes_one_json_event():
+    assert sse_event("token", {"text": "Hi\nthere"}) == 'event: token\ndata: {"text": "Hi\\nthere"}\n\n'
+    assert sse_event("done", None) == "event: done\ndata: null\n\n"
+
+
+def test_format_news_context():
+    articles = [{"title": "T", "content": "C", "url": "https://example.com/t", "score": 0.5, "doc_id": "d"}]
+    assert format_news_context(articles) == [
+        {"title": "T", "content": "C", "url": "https://example.com/t", "relevance_score": 0.5}
+    ]
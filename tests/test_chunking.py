@@ -0,0 +1,43 @@
+from app.services.chunking import chunk_articles, chunk_text, document_id, split_sentences
+
+TEXT = "One two three. Four five six. Seven eight nine. Ten eleven twelve."
+
+
+def test_split_sentences_keeps_closing_quotes_and_paragraphs():
+    text = 'He said "Stop." Then left.\n\nNew para (really.) Done.'
+    assert split_sentences(text) == ['He said "Stop."', "Then left.", "New para (really.)", "Done."]
+
+
+def test_chunks_fill_up_to_max_tokens_on_sentence_boundaries():
+    # 10 tokens = 40 characters
+    assert list(chunk_text(TEXT, max_tokens=10, overlap_tokens=0)) == [
+        "One two three. Four five six.",
+        "Seven eight nine. Ten eleven twelve.",
+    ]
+
+
+def test_chunks_overlap_by_trailing_sentences():
+    # 4 tokens = 16 characters: one 14-character sentence is carried over, a
+    # 17-character one is not
+    assert list(chunk_text(TEXT, max_tokens=10, overlap_tokens=4)) == [
+        "One two three. Four five six.",
+        "Four five six. Seven eight nine.",
+        "Ten eleven twelve.",
+    ]
+
+
+def test_long_sentences_are_split_on_words_then_characters():
+    assert list(chunk_text("alpha beta gamma delta epsilon zeta", max_tokens=3, overlap_tokens=0)) == [
+        "alpha beta", "gamma delta", "epsilon", "zeta"
+    ]
+    assert list(chunk_text("a" * 50, max_tokens=5, overlap_tokens=0)) == ["a" * 20, "a" * 20, "a" * 10]
+
+
+def test_chunk_articles_numbers_chunks_per_article():
+    article = {"title": "T", "url": "https://example.com/t", "date": "2025-01-01", "content": TEXT}
+    chunks = list(chunk_articles([article], max_tokens=10, overlap_tokens=0))
+    assert [(c["doc_id"], c["doc_idx"], c["chunk_idx"]) for c in chunks] == [
+        (document_id(article), 0, 0), (document_id(article), 0, 1)
+    ]
+    assert chunks[1]["content"] == "Seven eight nine. Ten eleven twelve."
+    assert chunks[0]["title"] == "T"
@@ -0,0 +1,52 @@
+import pytest
+
+from app.services import context_packer
+from app.services.context_packer import allocate_budget, pack_context, trim_to_budget
+
+RATES = {"title": "Rates", "content": "Rates were cut sharply today. Stocks rose on the news.", "score": 0.5}
+JOBS = {
+    "title": "Jobs",
+    "content": "Hiring slowed in March. Wages grew faster than expected. Unemployment held steady.",
+    "score": 0.5,
+}
+
+
+@pytest.fixture(autouse=True)
+def no_article_floor(monkeypatch):
+    monkeypatch.setattr(context_packer, "CONTEXT_MIN_ARTICLE_TOKENS", 0)
+
+
+def test_allocate_budget_is_proportional_and_passes_on_unused_share():
+    articles = [{"content": "x " * 200, "score": 0.9}, {"content": "y " * 40, "score": 0.1}]
+    # Shares 180/20; the first article only needs 100, the rest goes to the second (capped at its 20)
+    assert allocate_budget(articles, 200) == [100, 20]
+
+
+def test_allocate_budget_with_nothing_left():
+    assert allocate_budget([RATES, JOBS], 0) == [0, 0]
+    assert allocate_budget([], 100) == []
+
+
+def test_trim_keeps_best_sentences_in_order():
+    text = "Markets rallied today. The central bank cut interest rates by half a point. Analysts expect further cuts."
+    assert trim_to_budget(text, {"interest", "rates"}, 100) == text
+    assert trim_to_budget(text, {"interest", "rates"}, 16) == "The central bank cut interest rates by half a point."
+
+
+def test_trim_cuts_the_best_sentence_when_none_fits():
+    text = "The central bank cut interest rates by half a point."
+    assert trim_to_budget(text, {"rates"}, 5) == "The central bank cut"
+    # Cut inside a word: back off to the previous word boundary
+    assert trim_to_budget(text, {"rates"}, 3) == "The central"
+    assert trim_to_budget(text, {"rates"}, 0) == ""
+
+
+def test_pack_context_carries_unspent_budget_to_the_next_article():
+    packed, tokens = pack_context("rates jobs", [RATES, JOBS], budget=28)
+    # 4 title tokens leave 12 + 12; Rates only fits its 8-token first sentence,
+    # and the 5 tokens it leaves let Jobs keep a second sentence
+    assert [a["content"] for a in packed] == [
+        "Rates were cut sharply today.",
+        "Hiring slowed in March. Wages grew faster than expected.",
+    ]
+    assert tokens == 23
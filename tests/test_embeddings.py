@@ -0,0 +1,40 @@
+import pytest
+
+from app.services import embeddings
+from app.services.embeddings import _retry_delay, plan_batches
+
+
+class FakeResponse:
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+@pytest.fixture(autouse=True)
+def backoff(monkeypatch):
+    monkeypatch.setattr(embeddings, "EMBED_BACKOFF_BASE", 0.5)
+    monkeypatch.setattr(embeddings, "EMBED_BACKOFF_MAX", 30.0)
+    # Always take the top of the jitter range
+    monkeypatch.setattr(embeddings.random, "uniform", lambda low, high: high)
+
+
+def test_plan_batches_bounds_characters_and_items():
+    texts = ["a" * 40, "b" * 40, "c" * 40, {"content": "d" * 10}, "e", "f"]
+    assert plan_batches(texts, max_chars=100, max_items=3) == [(0, 2), (2, 5), (5, 6)]
+
+
+def test_plan_batches_gives_an_oversized_text_its_own_batch():
+    assert plan_batches(["a" * 10, "b" * 500, "c" * 10], max_chars=100, max_items=10) == [(0, 1), (1, 2), (2, 3)]
+    assert plan_batches([], max_chars=100, max_items=10) == []
+
+
+def test_retry_delay_is_capped_exponential_backoff():
+    assert [_retry_delay(attempt) for attempt in (0, 1, 3, 10)] == [0.5, 1.0, 4.0, 30.0]
+
+
+def test_retry_delay_honors_retry_after():
+    assert _retry_delay(0, FakeResponse(429, {"Retry-After": "3"})) == 3.0
+    assert _retry_delay(0, FakeResponse(503, {"Retry-After": "120"})) == 30.0
+    # Unparseable (an HTTP date) or on another status: back off as usual
+    assert _retry_delay(2, FakeResponse(429, {"Retry-After": "Wed, 21 Oct 2026 07:28:00 GMT"})) == 2.0
+    assert _retry_delay(2, FakeResponse(500, {"Retry-After": "3"})) == 2.0
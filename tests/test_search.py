@@ -0,0 +1,57 @@
+import pytest
+
+from app.services.search import group_by_document, mmr_select, reciprocal_rank_fusion
+
+
+def test_rrf_sums_weighted_reciprocal_ranks_normalized_to_one():
+    dense = [{"id": "a", "score": 0.9}, {"id": "b", "score": 0.8}]
+    sparse = [{"id": "b", "score": 12.0}, {"id": "c", "score": 7.0}]
+    fused = reciprocal_rank_fusion([dense, sparse], [1.0, 1.0], k=60)
+    assert [p["id"] for p in fused] == ["b", "a", "c"]
+    # Each score is sum(weight / (60 + rank)) divided by the best total 2 / 61
+    assert [p["score"] for p in fused] == pytest.approx([(1 / 62 + 1 / 61) * 61 / 2, 0.5, 61 / 124])
+    # The original score comes from the first list a point appears in
+    assert [p["raw_score"] for p in fused] == [0.8, 0.9, 7.0]
+
+
+def test_rrf_first_everywhere_scores_one():
+    points = [{"id": "a", "score": 0.5}, {"id": "b", "score": 0.4}]
+    fused = reciprocal_rank_fusion([points, points], [2.0, 1.0], k=10)
+    assert fused[0]["id"] == "a"
+    assert fused[0]["score"] == pytest.approx(1.0)
+    assert fused[1]["score"] == pytest.approx(11 / 12)
+
+
+def test_rrf_weights_favour_a_list():
+    dense = [{"id": "a"}, {"id": "b"}]
+    sparse = [{"id": "b"}, {"id": "a"}]
+    fused = reciprocal_rank_fusion([dense, sparse], [1.0, 3.0], k=60)
+    assert [p["id"] for p in fused] == ["b", "a"]
+
+
+def _group(name, score, vector):
+    return {"best": {"id": name, "score": score, "vector": vector}, "chunks": []}
+
+
+def test_mmr_skips_near_duplicates():
+    groups = [_group("a", 0.9, [1.0, 0.0]), _group("b", 0.85, [0.99, 0.141]), _group("c", 0.5, [0.0, 1.0])]
+    # Relevance rescales to a=1, b=0.875, c=0; b is ~0.99 similar to a, c is orthogonal
+    assert [g["best"]["id"] for g in mmr_select(groups, 2, lambda_=0.5)] == ["a", "c"]
+    assert [g["best"]["id"] for g in mmr_select(groups, 2, lambda_=1.0)] == ["a", "b"]
+
+
+def test_mmr_falls_back_to_score_order_without_vectors():
+    groups = [_group("a", 0.9, [1.0, 0.0]), _group("b", 0.85, None), _group("c", 0.5, [0.0, 1.0])]
+    assert [g["best"]["id"] for g in mmr_select(groups, 2, lambda_=0.5)] == ["a", "b"]
+    assert mmr_select(groups[:2], 3) == groups[:2]
+
+
+def test_group_by_document_orders_articles_by_best_chunk():
+    points = [
+        {"id": "1", "score": 0.9, "payload": {"doc_id": "x"}},
+        {"id": "2", "score": 0.8, "payload": {"doc_id": "y"}},
+        {"id": "3", "score": 0.7, "payload": {"doc_id": "x"}},
+    ]
+    groups = group_by_document(points)
+    assert [g["best"]["id"] for g in groups] == ["1", "2"]
+    assert [[p["id"] for p in g["chunks"]] for g in groups] == [["1", "3"], ["2"]]
@@ -0,0 +1,89 @@
+import asyncio
+import gc
+
+import pytest
+
+from app.services import single_flight as sf
+from app.services.single_flight import coalesce_key, single_flight
+
+
+@pytest.fixture(autouse=True)
+def local_only(monkeypatch):
+    monkeypatch.setattr(sf, "COALESCE_ENABLED", True)
+    monkeypatch.setattr(sf, "COALESCE_DISTRIBUTED", False)
+    sf._inflight.clear()
+
+
+def test_coalesce_key_normalizes_query_and_orders_params():
+    assert coalesce_key("  What  happened TODAY? ", top_k=3, since=None) == coalesce_key(
+        "what happened today?", since=None, top_k=3
+    )
+    assert coalesce_key("what happened today?", top_k=3) != coalesce_key("what happened today?", top_k=5)
+    assert coalesce_key("what happened today?") != coalesce_key("what happened yesterday?")
+
+
+def test_concurrent_callers_share_one_computation():
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {"answer": 42}
+
+    async def main():
+        return await asyncio.gather(*(single_flight("k", compute) for _ in range(5)))
+
+    results = asyncio.run(main())
+    assert results == [{"answer": 42}] * 5
+    assert len(calls) == 1
+    assert sf._inflight == {}
+
+
+def test_callers_all_get_the_exception():
+    async def compute():
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    async def main():
+        return await asyncio.gather(*(single_flight("k", compute) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert [type(r) for r in results] == [ValueError] * 3
+    assert sf._inflight == {}
+
+
+def test_follower_gets_result_after_leader_is_cancelled():
+    async def compute():
+        await asyncio.sleep(0.02)
+        return "done"
+
+    async def main():
+        leader = asyncio.create_task(single_flight("k", compute))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(single_flight("k", compute))
+        await asyncio.sleep(0)
+        leader.cancel()
+        return await follower
+
+    assert asyncio.run(main()) == "done"
+    assert sf._inflight == {}
+
+
+def test_cancelled_leader_without_followers_retrieves_the_exception():
+    unretrieved = []
+
+    async def compute():
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    async def main():
+        asyncio.get_running_loop().set_exception_handler(lambda loop, context: unretrieved.append(context))
+        leader = asyncio.create_task(single_flight("k", compute))
+        await asyncio.sleep(0)
+        leader.cancel()
+        await asyncio.sleep(0.05)
+        gc.collect()
+
+    asyncio.run(main())
+    assert unretrieved == []
+    assert sf._inflight == {}
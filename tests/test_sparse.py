@@ -0,0 +1,38 @@
+import pytest
+
+from app.services import sparse
+from app.services.sparse import document_sparse_vector, query_sparse_vector, term_id, tokenize
+
+APPLE, BANANA = 2838417488, 59467727
+
+
+@pytest.fixture(autouse=True)
+def bm25_defaults(monkeypatch):
+    monkeypatch.setattr(sparse, "BM25_K1", 1.2)
+    monkeypatch.setattr(sparse, "BM25_B", 0.75)
+    monkeypatch.setattr(sparse, "BM25_AVG_DOC_LEN", 180.0)
+
+
+def test_tokenize_keeps_identifiers_and_drops_stopwords():
+    assert tokenize("The CVE-2025-1234 patch, for gpt-4o and v3.5!") == ["cve-2025-1234", "patch", "gpt-4o", "v3.5"]
+
+
+def test_term_ids_are_stable_crc32():
+    assert term_id("apple") == APPLE
+    assert term_id("banana") == BANANA
+
+
+def test_document_vector_is_bm25_term_frequency():
+    indices, values = document_sparse_vector("Apple apple banana")
+    # 3 tokens: norm = 1.2 * (0.25 + 0.75 * 3 / 180) = 0.315; weight = tf * 2.2 / (tf + norm)
+    assert indices == [BANANA, APPLE]
+    assert values == pytest.approx([2.2 / 1.315, 4.4 / 2.315])
+
+
+def test_query_vector_weights_each_distinct_term_once():
+    assert query_sparse_vector("apple of apple banana") == ([BANANA, APPLE], [1.0, 1.0])
+
+
+def test_empty_text():
+    assert document_sparse_vector("the of and") == ([], [])
+    assert query_sparse_vector("") == ([], [])